@@ -0,0 +1,42 @@
+"""add rides.approvedCount
+
+Revision ID: 3f9c2d7a41be
+Revises: b168a0d39e08
+Create Date: 2026-10-18 10:12:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2d7a41be'
+down_revision: Union[str, Sequence[str], None] = 'b168a0d39e08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rides', sa.Column('approvedCount', sa.Integer(), server_default='0', nullable=False))
+    # backfill from the existing participant rows
+    op.execute(
+        """
+        UPDATE rides r
+        SET "approvedCount" = c.n
+        FROM (
+            SELECT "rideId", count(*) AS n
+            FROM ride_participants
+            WHERE status = 'APPROVED'
+            GROUP BY "rideId"
+        ) c
+        WHERE c."rideId" = r."rideId"
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('rides', 'approvedCount')
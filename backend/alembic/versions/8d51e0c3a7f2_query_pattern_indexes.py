@@ -0,0 +1,48 @@
+"""composite indexes for ride listing queries
+
+Revision ID: 8d51e0c3a7f2
+Revises: 3f9c2d7a41be
+Create Date: 2026-10-18 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d51e0c3a7f2'
+down_revision: Union[str, Sequence[str], None] = '3f9c2d7a41be'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY so a live rides table is not write-locked during the build;
+    # it cannot run in a transaction, hence autocommit_block(). Later index
+    # migrations build the same way.
+    with op.get_context().autocommit_block():
+        op.create_index('ix_rides_start_id', 'rides', ['rideStartTime', 'rideId'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_rides_status_start_id', 'rides', ['status', 'rideStartTime', 'rideId'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_rides_host_start_id', 'rides', ['hostId', 'rideStartTime', 'rideId'], unique=False, postgresql_concurrently=True)
+        op.create_index('ix_rides_upcoming_start_id', 'rides', ['rideStartTime', 'rideId'], unique=False, postgresql_where=sa.text("status = 'UPCOMING'"), postgresql_concurrently=True)
+        op.create_index('ix_ride_participants_user_status', 'ride_participants', ['userId', 'status'], unique=False, postgresql_concurrently=True)
+
+        # superseded by the composites above / low selectivity on its own
+        op.drop_index('ix_rides_rideStartTime', table_name='rides', postgresql_concurrently=True)
+        op.drop_index('ix_rides_status', table_name='rides', postgresql_concurrently=True)
+        op.drop_index('ix_ride_participants_status', table_name='ride_participants', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_ride_participants_status', 'ride_participants', ['status'], unique=False)
+    op.create_index('ix_rides_status', 'rides', ['status'], unique=False)
+    op.create_index('ix_rides_rideStartTime', 'rides', ['rideStartTime'], unique=False)
+    op.drop_index('ix_ride_participants_user_status', table_name='ride_participants')
+    op.drop_index('ix_rides_upcoming_start_id', table_name='rides')
+    op.drop_index('ix_rides_host_start_id', table_name='rides')
+    op.drop_index('ix_rides_status_start_id', table_name='rides')
+    op.drop_index('ix_rides_start_id', table_name='rides')
@@ -0,0 +1,34 @@
+"""composite index for paging ride comment threads
+
+Revision ID: a9d3c5e71b48
+Revises: f41b6d2e8a07
+Create Date: 2026-10-18 17:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d3c5e71b48'
+down_revision: Union[str, Sequence[str], None] = 'f41b6d2e8a07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # concurrent build, outside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_comments_ride_created_id', 'comments', ['rideId', 'createdAt', 'commentId'], unique=False, postgresql_concurrently=True)
+
+        # its leading column makes the composite a drop-in replacement
+        op.drop_index('ix_comments_rideId', table_name='comments', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_comments_rideId', 'comments', ['rideId'], unique=False)
+    op.drop_index('ix_comments_ride_created_id', table_name='comments')
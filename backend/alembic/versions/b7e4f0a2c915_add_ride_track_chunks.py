@@ -0,0 +1,41 @@
+"""add ride_track_chunks
+
+Revision ID: b7e4f0a2c915
+Revises: a9d3c5e71b48
+Create Date: 2026-10-18 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e4f0a2c915'
+down_revision: Union[str, Sequence[str], None] = 'a9d3c5e71b48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ride_track_chunks',
+    sa.Column('chunkId', sa.BigInteger(), sa.Identity(), nullable=False),
+    sa.Column('rideId', sa.UUID(), nullable=False),
+    sa.Column('userId', sa.UUID(), nullable=False),
+    sa.Column('startTime', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('endTime', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('pointCount', sa.Integer(), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['rideId'], ['rides.rideId'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['userId'], ['users.userId'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('chunkId')
+    )
+    op.create_index('ix_ride_track_chunks_ride_user_start', 'ride_track_chunks', ['rideId', 'userId', 'startTime'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ride_track_chunks_ride_user_start', table_name='ride_track_chunks')
+    op.drop_table('ride_track_chunks')
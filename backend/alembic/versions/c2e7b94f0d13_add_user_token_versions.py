@@ -0,0 +1,35 @@
+"""add user_token_versions
+
+Revision ID: c2e7b94f0d13
+Revises: 8d51e0c3a7f2
+Create Date: 2026-10-18 13:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2e7b94f0d13'
+down_revision: Union[str, Sequence[str], None] = '8d51e0c3a7f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_token_versions',
+    sa.Column('userId', sa.UUID(), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    sa.ForeignKeyConstraint(['userId'], ['users.userId'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('userId')
+    )
+    # every existing user starts at version 1
+    op.execute('INSERT INTO user_token_versions ("userId", version) SELECT "userId", 1 FROM users')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_token_versions')
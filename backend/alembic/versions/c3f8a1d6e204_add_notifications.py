@@ -0,0 +1,45 @@
+"""add notifications outbox
+
+Revision ID: c3f8a1d6e204
+Revises: b7e4f0a2c915
+Create Date: 2026-10-18 21:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f8a1d6e204'
+down_revision: Union[str, Sequence[str], None] = 'b7e4f0a2c915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notifications',
+    sa.Column('notificationId', sa.BigInteger(), sa.Identity(), nullable=False),
+    sa.Column('userId', sa.UUID(), nullable=False),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('createdAt', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('dispatchedAt', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('readAt', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['userId'], ['users.userId'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('notificationId')
+    )
+    op.create_index('ix_notifications_user_id', 'notifications', ['userId', 'notificationId'], unique=False)
+    op.create_index('ix_notifications_undispatched', 'notifications', ['notificationId'], unique=False, postgresql_where=sa.text('"dispatchedAt" IS NULL'))
+    op.create_index('ix_notifications_user_unread', 'notifications', ['userId'], unique=False, postgresql_where=sa.text('"readAt" IS NULL'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notifications_user_unread', table_name='notifications', postgresql_where=sa.text('"readAt" IS NULL'))
+    op.drop_index('ix_notifications_undispatched', table_name='notifications', postgresql_where=sa.text('"dispatchedAt" IS NULL'))
+    op.drop_index('ix_notifications_user_id', table_name='notifications')
+    op.drop_table('notifications')
@@ -0,0 +1,45 @@
+"""add ride coordinates and geohash indexes
+
+Revision ID: e5a81f3c9d26
+Revises: c2e7b94f0d13
+Create Date: 2026-10-18 15:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a81f3c9d26'
+down_revision: Union[str, Sequence[str], None] = 'c2e7b94f0d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('rides', sa.Column('startLat', sa.Float(), nullable=True))
+    op.add_column('rides', sa.Column('startLon', sa.Float(), nullable=True))
+    op.add_column('rides', sa.Column('startGeohash', sa.String(length=12), nullable=True))
+    op.add_column('rides', sa.Column('endLat', sa.Float(), nullable=True))
+    op.add_column('rides', sa.Column('endLon', sa.Float(), nullable=True))
+    op.add_column('rides', sa.Column('endGeohash', sa.String(length=12), nullable=True))
+
+    # concurrent build, outside the migration transaction
+    with op.get_context().autocommit_block():
+        op.create_index('ix_rides_upcoming_start_geohash', 'rides', ['startGeohash'], unique=False, postgresql_ops={'startGeohash': 'varchar_pattern_ops'}, postgresql_where=sa.text("status = 'UPCOMING'"), postgresql_concurrently=True)
+        op.create_index('ix_rides_upcoming_end_geohash', 'rides', ['endGeohash'], unique=False, postgresql_ops={'endGeohash': 'varchar_pattern_ops'}, postgresql_where=sa.text("status = 'UPCOMING'"), postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_rides_upcoming_end_geohash', table_name='rides')
+    op.drop_index('ix_rides_upcoming_start_geohash', table_name='rides')
+    op.drop_column('rides', 'endGeohash')
+    op.drop_column('rides', 'endLon')
+    op.drop_column('rides', 'endLat')
+    op.drop_column('rides', 'startGeohash')
+    op.drop_column('rides', 'startLon')
+    op.drop_column('rides', 'startLat')
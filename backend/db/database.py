@@ -1,5 +1,7 @@
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
@@ -7,17 +9,122 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# -------------------------
+# Pool settings (env)
+# -------------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
 Base = declarative_base()
 
-def get_engine():
+# one engine (and one pool) per process, created on first use.
+# The API runs on the async engine; the sync one is only for scripts.
+_engine = None
+_session_local = None
+_async_engine = None
+_async_session_local = None
+
+
+def _database_url() -> str:
     database_url = os.getenv("DATABASE_URL")
     if not database_url:
         raise RuntimeError("DATABASE_URL not set")
-    return create_engine(database_url)
+    return database_url
+
+
+def _async_database_url() -> str:
+    # psycopg (v3) serves both sync and asyncio, so point any
+    # postgres url at it regardless of the driver named in .env
+    url = make_url(_database_url())
+    return url.set(drivername="postgresql+psycopg").render_as_string(hide_password=False)
+
+
+def get_libpq_dsn() -> str:
+    """Plain libpq url, for raw psycopg connections (e.g. LISTEN)."""
+    url = make_url(_database_url())
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def _pool_options() -> dict:
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(_database_url(), **_pool_options())
+    return _engine
+
 
 def get_session_local():
-    engine = get_engine()
-    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+    global _session_local
+    if _session_local is None:
+        _session_local = sessionmaker(bind=get_engine(), autoflush=False, autocommit=False)
+    return _session_local
 
 
-Base = declarative_base()
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(_async_database_url(), **_pool_options())
+    return _async_engine
+
+
+def get_async_session_local():
+    global _async_session_local
+    if _async_session_local is None:
+        # keep attributes loaded after commit: async sessions cannot lazy-load
+        _async_session_local = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _async_session_local
+
+
+def dispose_engine():
+    """Close every pooled connection of the sync engine."""
+    global _engine, _session_local
+    if _engine is not None:
+        _engine.dispose()
+    _engine = None
+    _session_local = None
+
+
+async def dispose_async_engine():
+    """Close every pooled connection; called on app shutdown."""
+    global _async_engine, _async_session_local
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _async_session_local = None
+
+
+def _stats(engine) -> dict:
+    if engine is None:
+        return {"initialized": False}
+    pool = engine.pool
+    return {
+        "initialized": True,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout": DB_POOL_TIMEOUT,
+    }
+
+
+def get_pool_stats() -> dict:
+    stats = _stats(_async_engine.sync_engine if _async_engine is not None else None)
+    stats["sync"] = _stats(_engine)
+    return stats
@@ -1,9 +1,6 @@
-from db.database import get_session_local
+from db.database import get_async_session_local
 
-def get_db():
-    SessionLocal = get_session_local()
-    db = SessionLocal()
-    try:
+async def get_db():
+    SessionLocal = get_async_session_local()
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
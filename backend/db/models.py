@@ -7,13 +7,19 @@ from typing import Optional
 from sqlalchemy import (
     String,
     Integer,
+    BigInteger,
+    LargeBinary,
+    Identity,
     Float,
     ForeignKey,
     DateTime,
     Enum,
+    Index,
     UniqueConstraint,
+    Computed,
+    text,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR, JSONB
 from sqlalchemy.orm import Mapped, mapped_column, relationship, DeclarativeBase
 import enum
 
@@ -71,6 +77,29 @@ class User(Base):
     comments = relationship("Comment", back_populates="user")
 
 
+# -------------------------
+# UserTokenVersion
+# -------------------------
+# Access tokens embed the version current at login; bumping it revokes
+# every token issued before. A missing row means the user is gone.
+
+class UserTokenVersion(Base):
+    __tablename__ = "user_token_versions"
+
+    userId: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.userId", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    version: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+    )
+
+
 # -------------------------
 # Ride
 # -------------------------
@@ -101,12 +130,20 @@ class Ride(Base):
     rideStartTime: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
         nullable=False,
-        index=True,
     )
 
     rideStartPoint: Mapped[str] = mapped_column(String(255), nullable=False)
     rideEndPoint: Mapped[str] = mapped_column(String(255), nullable=False)
 
+    # optional coordinates; geohashes are set from them by services/ride.py
+    # and back the "rides near me" search (services/geo.py)
+    startLat: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    startLon: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    startGeohash: Mapped[Optional[str]] = mapped_column(String(12), nullable=True)
+    endLat: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    endLon: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    endGeohash: Mapped[Optional[str]] = mapped_column(String(12), nullable=True)
+
     rideDuration: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
     haltDuration: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
 
@@ -117,10 +154,69 @@ class Ride(Base):
         nullable=False,
     )
 
+    # kept in step with APPROVED ride_participants rows by services/ride.py
+    approvedCount: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+
     status: Mapped[RideStatus] = mapped_column(
         Enum(RideStatus, name="ride_status"),
         nullable=False,
-        index=True,
+    )
+
+    # search columns maintained by Postgres: word/prefix matches go through
+    # the tsvector, partial (infix) matches through trigrams on searchText
+    searchVector: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(
+            """to_tsvector('simple', "rideName" || ' ' || "rideStartPoint" || ' ' || "rideEndPoint")""",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+    searchText: Mapped[str] = mapped_column(
+        String,
+        Computed(
+            """lower("rideName" || ' ' || "rideStartPoint" || ' ' || "rideEndPoint")""",
+            persisted=True,
+        ),
+        deferred=True,
+    )
+
+    # listings page on (rideStartTime, rideId), see services/pagination.py
+    __table_args__ = (
+        Index("ix_rides_start_id", "rideStartTime", "rideId"),
+        Index("ix_rides_status_start_id", "status", "rideStartTime", "rideId"),
+        Index("ix_rides_host_start_id", "hostId", "rideStartTime", "rideId"),
+        Index(
+            "ix_rides_upcoming_start_id",
+            "rideStartTime",
+            "rideId",
+            postgresql_where=text("status = 'UPCOMING'"),
+        ),
+        # prefix (LIKE 'abc%') scans for nearby upcoming rides
+        Index(
+            "ix_rides_upcoming_start_geohash",
+            "startGeohash",
+            postgresql_ops={"startGeohash": "varchar_pattern_ops"},
+            postgresql_where=text("status = 'UPCOMING'"),
+        ),
+        Index(
+            "ix_rides_upcoming_end_geohash",
+            "endGeohash",
+            postgresql_ops={"endGeohash": "varchar_pattern_ops"},
+            postgresql_where=text("status = 'UPCOMING'"),
+        ),
+        Index("ix_rides_search_vector", "searchVector", postgresql_using="gin"),
+        Index(
+            "ix_rides_search_text_trgm",
+            "searchText",
+            postgresql_using="gin",
+            postgresql_ops={"searchText": "gin_trgm_ops"},
+        ),
     )
 
     # Relationships
@@ -151,7 +247,6 @@ class RideParticipant(Base):
     status: Mapped[ParticipantStatus] = mapped_column(
         Enum(ParticipantStatus, name="participant_status"),
         nullable=False,
-        index=True,
     )
 
     requestedAt: Mapped[datetime] = mapped_column(
@@ -165,6 +260,11 @@ class RideParticipant(Base):
         nullable=True,
     )
 
+    # the primary key already leads with rideId; this serves per-user lookups
+    __table_args__ = (
+        Index("ix_ride_participants_user_status", "userId", "status"),
+    )
+
     # Relationships
     ride = relationship("Ride", back_populates="participants")
     user = relationship("User", back_populates="ride_participations")
@@ -187,7 +287,6 @@ class Comment(Base):
         UUID(as_uuid=True),
         ForeignKey("rides.rideId", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
 
     userId: Mapped[uuid.UUID] = mapped_column(
@@ -205,6 +304,92 @@ class Comment(Base):
         nullable=False,
     )
 
+    # threads page newest-first on (createdAt, commentId) within a ride
+    __table_args__ = (
+        Index("ix_comments_ride_created_id", "rideId", "createdAt", "commentId"),
+    )
+
     # Relationships
     ride = relationship("Ride", back_populates="comments")
     user = relationship("User", back_populates="comments")
+
+
+# -------------------------
+# RideTrackChunk
+# -------------------------
+
+class RideTrackChunk(Base):
+    """A run of one rider's GPS fixes, delta-encoded (see services/track.py)."""
+
+    __tablename__ = "ride_track_chunks"
+
+    chunkId: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+
+    rideId: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("rides.rideId", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    userId: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.userId", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    startTime: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    endTime: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    pointCount: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+
+    # a track is read back per ride (optionally per rider) in time order
+    __table_args__ = (
+        Index("ix_ride_track_chunks_ride_user_start", "rideId", "userId", "startTime"),
+    )
+
+
+# -------------------------
+# Notification
+# -------------------------
+
+class Notification(Base):
+    """A message for one user, written in the transaction of the change it
+    reports and pushed over /ws by services/notification.py (outbox)."""
+
+    __tablename__ = "notifications"
+
+    # increasing id, clients resume from the last one they saw
+    notificationId: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+
+    userId: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.userId", ondelete="CASCADE"),
+        nullable=False,
+    )
+
+    type: Mapped[str] = mapped_column(String(50), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+
+    createdAt: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=text("now()"),
+    )
+    dispatchedAt: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    readAt: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # replay: a user's notifications after the last seen id
+        Index("ix_notifications_user_id", "userId", "notificationId"),
+        # dispatcher queue, only the rows still to send
+        Index(
+            "ix_notifications_undispatched",
+            "notificationId",
+            postgresql_where=text('"dispatchedAt" IS NULL'),
+        ),
+        Index(
+            "ix_notifications_user_unread",
+            "userId",
+            postgresql_where=text('"readAt" IS NULL'),
+        ),
+    )
@@ -1,15 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from routers.user import router as user_router
 from routers.auth import router as auth_router
 from routers.ride import router as ride_router
+from routers.comment import router as comment_router
+from routers.notification import router as notification_router
 from fastapi import WebSocket, WebSocketDisconnect
 from websocket_manager import manager
-from services.auth import get_user
-from services.auth import decode_token 
-from db.database import get_session_local
+from services.location import location_hub, handle_client_message, ClientRateLimit
+from services.scheduler import ride_scheduler
+from services.notification import notification_dispatcher, replay
+from services.auth import get_principal_from_token
+from services.serializers import render
+from services.auth import get_cache_stats as get_auth_cache_stats
+from services.ride import listing_cache, detail_cache
+from services.password import get_pool_stats as get_hash_pool_stats
+from db.database import get_async_engine, get_async_session_local, dispose_async_engine, get_pool_stats
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # build the engine/pool once per worker, release it on shutdown
+    get_async_engine()
+    await manager.start()
+    await location_hub.start()
+    await notification_dispatcher.start()
+    await ride_scheduler.start()
+    yield
+    await ride_scheduler.stop()
+    await notification_dispatcher.stop()
+    await location_hub.stop()
+    await manager.stop()
+    await dispose_async_engine()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,6 +48,21 @@ app.add_middleware(
 def health_check():
     return {"status": "ok"}
 
+# pool, cache and websocket stats for monitoring
+@app.get("/metrics")
+async def metrics():
+    return {
+        "db_pool": get_pool_stats(),
+        "password_hashing": get_hash_pool_stats(),
+        "auth_cache": get_auth_cache_stats(),
+        "listing_cache": listing_cache.stats(),
+        "detail_cache": detail_cache.stats(),
+        "websockets": manager.stats(),
+        "live_location": location_hub.stats(),
+        "ride_scheduler": ride_scheduler.stats(),
+        "notifications": notification_dispatcher.stats(),
+    }
+
 #------------------------------------
 # this is purely for notifications
 #------------------------------------
@@ -35,35 +74,50 @@ async def websocket_endpoint(websocket: WebSocket):
         await websocket.close(code=1008)
         return
 
-    username = decode_token(token)
-    if not username:
+    # short-lived session: don't pin a pooled connection for the socket's lifetime
+    SessionLocal = get_async_session_local()
+    async with SessionLocal() as db:
+        principal = await get_principal_from_token(db, token)
+
+    if not principal:
         await websocket.close(code=1008)
         return
 
-    SessionLocal = get_session_local()
-    db = SessionLocal()
+    user_id = str(principal.userId)
+    connection = await manager.connect(user_id, websocket)
 
-    try:
-        user = get_user(db, username)
-        if not user:
-            await websocket.close(code=1008)
-            return
-    
-        user_id = str(user.userId)
-        await manager.connect(user_id, websocket)
+    rate = ClientRateLimit()
 
+    try:
+        # ?last_id=N: resend what was missed while disconnected. Registered
+        # first, so anything dispatched meanwhile may arrive twice (same
+        # notificationId) but is never lost.
         try:
-            while True:
-                await websocket.receive_text()
-        except WebSocketDisconnect:
-            manager.disconnect(user_id)
+            last_id = int(websocket.query_params.get("last_id", ""))
+        except ValueError:
+            last_id = None
+        # 0 or no last_id: a fresh client, nothing to catch up on
+        if last_id is not None and last_id > 0:
+            async with SessionLocal() as db:
+                frames = await replay(db, principal.userId, last_id)
+            for frame in frames:
+                connection.enqueue(render(frame).decode())
 
+        while True:
+            # clients answer PING with PONG; any inbound frame keeps them alive
+            text = await websocket.receive_text()
+            connection.touch()
+            await handle_client_message(user_id, text, rate)
+    except WebSocketDisconnect:
+        pass
     finally:
-        db.close()
+        manager.disconnect(connection)
 
 app.include_router(user_router)
 app.include_router(auth_router)
 app.include_router(ride_router)
+app.include_router(comment_router)
+app.include_router(notification_router)
 
 
 
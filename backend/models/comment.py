@@ -0,0 +1,23 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+# Request model for posting a comment
+class CommentCreate(BaseModel):
+    # small enough that the live broadcast fits in one NOTIFY payload:
+    # envelopes are UTF-8, so even 1000 emoji stay near 4000 bytes
+    commentText: str = Field(min_length=1, max_length=1000)
+
+# Response model for one comment
+class CommentResponse(BaseModel):
+    commentId: str
+    rideId: str
+    userId: str
+    username: str
+    commentText: str
+    createdAt: datetime
+
+# One page of a thread, newest first, plus the cursor for older comments
+class CommentPage(BaseModel):
+    items: List[CommentResponse]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Request model for marking notifications read; no ids = all of them
+class NotificationsRead(BaseModel):
+    ids: Optional[List[int]] = Field(default=None, max_length=500)
+
+# Response model for the unread badge
+class UnreadCount(BaseModel):
+    unread: int
+
+# Response model for a mark-read call
+class NotificationsMarked(BaseModel):
+    marked: int
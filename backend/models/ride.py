@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
 from datetime import datetime
 import uuid
@@ -35,6 +35,10 @@ class Ride(BaseModel):
     haltDuration: Optional[float] = None
     routeLink: Optional[str] = None
     maxParticipants: int = 20
+    startLat: Optional[float] = Field(None, ge=-90, le=90)
+    startLon: Optional[float] = Field(None, ge=-180, le=180)
+    endLat: Optional[float] = Field(None, ge=-90, le=90)
+    endLon: Optional[float] = Field(None, ge=-180, le=180)
 
 # Response model for listing rides
 class RideResponse(BaseModel):
@@ -47,11 +51,32 @@ class RideResponse(BaseModel):
     haltDuration: Optional[float] = None
     routeLink: Optional[str] = None
     maxParticipants: int
+    approvedCount: int = 0
     status: str
+    startLat: Optional[float] = None
+    startLon: Optional[float] = None
+    endLat: Optional[float] = None
+    endLon: Optional[float] = None
     host: UserResponse
     participants: ParticipantsGroup
     
     class Config:
         from_attributes = True
 
+# One page of rides plus the cursor for the next page
+class RidePage(BaseModel):
+    items: List[RideResponse]
+    next_cursor: Optional[str] = None
 
+# Ride plus its distance from the search point
+class NearbyRide(RideResponse):
+    distanceKm: float
+
+class NearbyRides(BaseModel):
+    items: List[NearbyRide]
+
+# Bulk approve/reject of join requests (host only)
+class ParticipantDecisions(BaseModel):
+    # bounds the IN list, row locks and notifications one request can cause
+    userIds: List[uuid.UUID] = Field(max_length=100)
+    approve: bool
@@ -2,9 +2,11 @@ from datetime import timedelta
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.dependencies import get_db
-from services.auth import authenticate_user, create_access_token, get_current_user_from_token
+from services.auth import (authenticate_user, issue_access_token, get_current_user_from_token,
+                           get_principal_from_token, revoke_tokens, Principal)
+from services.password import HashingPoolSaturated
 from models.auth import LoginUser
 
 router = APIRouter(tags=["auth"])
@@ -15,11 +17,19 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 # Dependencies
 # -------------
 
+def too_many_logins() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Server busy, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = get_current_user_from_token(db, token)
+    user = await get_current_user_from_token(db, token)
 
     if user is None:
         raise HTTPException(
@@ -35,6 +45,22 @@ async def get_current_active_user(
 ):
     return current_user
 
+# identity from the token alone, for routes that only need the user id
+async def get_current_principal(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
+    principal = await get_principal_from_token(db, token)
+
+    if principal is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return principal
+
 
 # -------
 # Routes
@@ -43,9 +69,12 @@ async def get_current_active_user(
 @router.post("/token")
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HashingPoolSaturated:
+        raise too_many_logins()
 
     if not user:
         raise HTTPException(
@@ -56,8 +85,9 @@ async def login_for_access_token(
 
     access_token_expires = timedelta(minutes=30)
 
-    access_token = create_access_token(
-        data={"sub": user.username},
+    access_token = await issue_access_token(
+        db,
+        user,
         expires_delta=access_token_expires,
     )
 
@@ -65,9 +95,12 @@ async def login_for_access_token(
 
 
 @router.post("/users/login")
-async def login_user(user: LoginUser, db: Session = Depends(get_db)):
+async def login_user(user: LoginUser, db: AsyncSession = Depends(get_db)):
     
-    db_user = authenticate_user(db, user.username, user.password)
+    try:
+        db_user = await authenticate_user(db, user.username, user.password)
+    except HashingPoolSaturated:
+        raise too_many_logins()
 
     if not db_user:
         raise HTTPException(
@@ -75,11 +108,19 @@ async def login_user(user: LoginUser, db: Session = Depends(get_db)):
             detail="Invalid username or password"
         )
 
-    access_token = create_access_token(
-        data={"sub": db_user.username}
-    )
+    access_token = await issue_access_token(db, db_user)
 
     return {
         "access_token": access_token,
         "token_type": "bearer"
-    }
\ No newline at end of file
+    }
+
+
+# sign out everywhere: every token issued so far stops working
+@router.post("/users/logout-all")
+async def logout_all(
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await revoke_tokens(db, current_user)
+    return {"message": "All sessions revoked"}
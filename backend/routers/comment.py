@@ -0,0 +1,71 @@
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dependencies import get_db
+from models.comment import CommentCreate, CommentResponse, CommentPage
+from routers.auth import get_current_principal
+from services.auth import Principal
+from services.comment import create_comment, list_comments
+from services.pagination import DEFAULT_PAGE_SIZE
+from services.serializers import json_response
+
+router = APIRouter(tags=["comments"])
+
+
+def _ride_uuid(ride_id: str) -> uuid.UUID:
+    try:
+        return uuid.UUID(ride_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="invalid ride id")
+
+
+# -----------------------------------------
+# post a comment (ride members only)
+# -----------------------------------------
+@router.post("/rides/{ride_id}/comments", response_model=CommentResponse)
+async def post_comment(
+    ride_id: str,
+    comment: CommentCreate,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return await create_comment(
+            db=db,
+            ride_id=_ride_uuid(ride_id),
+            user_id=current_user.userId,
+            username=current_user.username,
+            text=comment.commentText,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
+
+# -----------------------------------------
+# read a ride's thread, newest first
+# -----------------------------------------
+@router.get("/rides/{ride_id}/comments", response_model=CommentPage)
+async def read_comments(
+    ride_id: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return json_response(await list_comments(
+            db=db,
+            ride_id=_ride_uuid(ride_id),
+            requester_id=current_user.userId,
+            cursor=cursor,
+            limit=limit,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
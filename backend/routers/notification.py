@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.dependencies import get_db
+from models.notification import NotificationsRead, UnreadCount, NotificationsMarked
+from routers.auth import get_current_principal
+from services.auth import Principal
+from services.notification import unread_count, mark_read
+
+router = APIRouter(tags=["notifications"])
+
+
+# -----------------------------------------
+# unread badge (cheap: partial index)
+# -----------------------------------------
+@router.get("/notifications/unread-count", response_model=UnreadCount)
+async def read_unread_count(
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    return {"unread": await unread_count(db, current_user.userId)}
+
+
+# -----------------------------------------
+# mark notifications read
+# -----------------------------------------
+@router.post("/notifications/read", response_model=NotificationsMarked)
+async def mark_notifications_read(
+    body: NotificationsRead,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    return {"marked": await mark_read(db, current_user.userId, body.ids)}
@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from models.ride import Ride, RideResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.ride import Ride, RideResponse, RidePage, ParticipantDecisions, NearbyRides
 from services.ride import create_ride as ride_service_create
 from db.dependencies import get_db
-from routers.auth import get_current_user
-from services.ride import get_all_rides, get_upcoming_rides
+from routers.auth import get_current_principal
+from services.ride import get_all_rides, get_upcoming_rides, get_rides_near
+from services.pagination import DEFAULT_PAGE_SIZE, clamp_limit
+from services.ride import listing_cache, detail_cache, ride_detail_key
+from services.serializers import page_payload, render, json_response
+from services.track import get_track_stats
 import uuid
+from datetime import datetime
 from typing import List, Optional
-from db.models import User, RideStatus, RideParticipant, ParticipantStatus
+from db.models import RideStatus, RideParticipant, ParticipantStatus
+from services.auth import Principal
 from services.ride import (request_ride_participation, 
-                            decide_participation, get_ride_details, leave_ride,
+                            decide_participation, decide_participations,
+                            get_ride_details, leave_ride,
                             cancel_ride, list_rides)
 
 
@@ -18,64 +25,49 @@ router = APIRouter(tags=["rides"])
 
 
 # -------------------------
-# Helper function to serialize rides
+# Cached responses
 # -------------------------
-def serialize_rides(rides):
-    """Convert database ride objects to RideResponse format"""
-    serialized = []
-    for ride in rides:
-        approved = []
-        pending = []
-        rejected = []
-        
-        for p in ride.participants:
-            participant_data = {
-                "userId": str(p.userId),
-                "username": p.user.username,
-                "status": p.status.value,
-            }
-            
-            if p.status == ParticipantStatus.APPROVED:
-                approved.append(participant_data)
-            elif p.status == ParticipantStatus.PENDING:
-                pending.append(participant_data)
-            elif p.status == ParticipantStatus.REJECTED:
-                rejected.append(participant_data)
-        
-        ride_response = {
-            "rideId": str(ride.rideId),
-            "rideName": ride.rideName,
-            "rideStartTime": ride.rideStartTime,
-            "rideStartPoint": ride.rideStartPoint,
-            "rideEndPoint": ride.rideEndPoint,
-            "rideDuration": ride.rideDuration,
-            "haltDuration": ride.haltDuration,
-            "routeLink": ride.routeLink,
-            "maxParticipants": ride.maxParticipants,
-            "status": ride.status.value,
-            "host": {
-                "userId": str(ride.host.userId),
-                "username": ride.host.username,
-            },
-            "participants": {
-                "approved": approved,
-                "pending": pending,
-                "rejected": rejected,
-            }
-        }
-        serialized.append(ride_response)
-    
-    return serialized
+def cached_body_response(request: Request, entry) -> Response:
+    """Send a (body, etag) cache entry, or 304 if If-None-Match matches."""
+    body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+async def cached_listing(request: Request, key, load) -> Response:
+    """Serve a rendered page from listing_cache."""
+    entry = listing_cache.get(key)
+    if entry is None:
+        generation = listing_cache.generation
+        items, next_cursor = await load()
+        body = render(page_payload(items, next_cursor))
+        entry = listing_cache.set(key, body, generation)
+    return cached_body_response(request, entry)
+
+
+async def cached_detail(request: Request, db: AsyncSession, ride_id: uuid.UUID, requester_id) -> Response:
+    """Serve a rendered ride detail from detail_cache."""
+    key = ride_detail_key(ride_id, requester_id)
+    entry = detail_cache.get(key) if key is not None else None
+    if entry is None:
+        generation = detail_cache.generation
+        details = await get_ride_details(db=db, ride_id=ride_id, requester_id=requester_id)
+        # the first load tells us the host, so the key is known now
+        key = ride_detail_key(ride_id, requester_id)
+        entry = detail_cache.set(key, render(details), generation)
+    return cached_body_response(request, entry)
 
 
 #-----------------------------------------------------------
 # create a new ride using the currently authenticated user
 #-----------------------------------------------------------
 @router.post("/create-ride")
-def create_ride(ride: Ride,db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)):
+async def create_ride(ride: Ride,db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)):
         try:
-            new_ride = ride_service_create(
+            new_ride = await ride_service_create(
                 db=db,
                 ride_data=ride,
                 host_id=current_user.userId  # pass current user ID
@@ -90,19 +82,71 @@ def create_ride(ride: Ride,db: Session = Depends(get_db),
 # -------------------------
 # Get all rides
 # -------------------------
-@router.get("/rides", response_model=List[RideResponse])
-def show_all_rides(db: Session = Depends(get_db)):
-    rides = get_all_rides(db)
-    return serialize_rides(rides)
+@router.get("/rides", response_model=RidePage)
+async def show_all_rides(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_db),
+):
+    limit = clamp_limit(limit)
+    try:
+        return await cached_listing(
+            request,
+            ("rides", cursor, limit),
+            lambda: get_all_rides(db, cursor=cursor, limit=limit),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
 # -------------------------
 # Get UPCOMING rides
 # -------------------------
-@router.get("/upcoming-rides", response_model=List[RideResponse])
-def show_upcoming_rides(db: Session = Depends(get_db)):
-    rides = get_upcoming_rides(db)
-    return serialize_rides(rides)
+@router.get("/upcoming-rides", response_model=RidePage)
+async def show_upcoming_rides(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_db),
+):
+    limit = clamp_limit(limit)
+    try:
+        return await cached_listing(
+            request,
+            ("upcoming-rides", cursor, limit),
+            lambda: get_upcoming_rides(db, cursor=cursor, limit=limit),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+# -------------------------
+# Upcoming rides near a point
+# -------------------------
+@router.get("/rides/nearby", response_model=NearbyRides)
+async def show_rides_nearby(
+    lat: float,
+    lon: float,
+    radius_km: float = 25,
+    starts_after: Optional[datetime] = None,
+    starts_before: Optional[datetime] = None,
+    by: str = "start",
+    limit: int = DEFAULT_PAGE_SIZE,
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        return json_response(await get_rides_near(
+            db,
+            lat=lat,
+            lon=lon,
+            radius_km=radius_km,
+            starts_after=starts_after,
+            starts_before=starts_before,
+            by=by,
+            limit=limit,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 # ----------------------------
 # join ride(request the host)
@@ -110,8 +154,8 @@ def show_upcoming_rides(db: Session = Depends(get_db)):
 @router.post("/rides/{ride_id}/request")
 async def request_participation(
     ride_id: str,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
     try:
         participation = await request_ride_participation(
@@ -135,8 +179,8 @@ async def decide_participant_route(
     ride_id: str,
     user_id: str,
     approve: bool, 
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
 ):
     try:
         result = await decide_participation(
@@ -156,44 +200,91 @@ async def decide_participant_route(
 
 
 
+# ------------------------------------------------
+# approve/reject many requests at once (host)
+# ------------------------------------------------
+@router.post("/rides/{ride_id}/participants/decisions")
+async def decide_participants_route(
+    ride_id: str,
+    decisions: ParticipantDecisions,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    try:
+        return await decide_participations(
+            db=db,
+            host_id=current_user.userId,
+            ride_id=ride_id,
+            participant_user_ids=decisions.userIds,
+            approve=decisions.approve,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
 # --------------------------------
 # get all details about the ride
 # --------------------------------
-@router.get("/all-rides-details/{ride_id}")
-def read_ride_details(
+@router.get("/all-rides-details/{ride_id}", response_model=RideResponse)
+async def read_ride_details(
+    request: Request,
     ride_id: str,
-    db: Session = Depends(get_db),
-    current_user = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
-    return get_ride_details(
-        db=db,
-        ride_id=ride_id,
-        requester_id=current_user.userId
-    )
+    try:
+        return await cached_detail(request, db, uuid.UUID(ride_id), current_user.userId)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
 
 
+# --------------------------------
+# recorded track stats per rider
+# --------------------------------
+@router.get("/rides/{ride_id}/track-stats")
+async def read_track_stats(
+    ride_id: uuid.UUID,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+):
+    try:
+        return json_response(await get_track_stats(db, ride_id, current_user.userId))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
+
 # --------------------------------
 # leave ride(for participant)
 # --------------------------------
 @router.delete("/rides/{ride_id}/leave")
-def leave_ride_route(
+async def leave_ride_route(
     ride_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
 ):
-    return leave_ride(db, ride_id, current_user.userId)
+    return await leave_ride(db, ride_id, current_user.userId)
 
 
 # ------------------------------------------------
 # cancel ride(only for the host)
 # ------------------------------------------------
 @router.patch("/rides/{ride_id}/cancel")
-def cancel_ride_route(
+async def cancel_ride_route(
     ride_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
 ):
-    return cancel_ride(db, ride_id, current_user.userId)
+    try:
+        return await cancel_ride(db, ride_id, current_user.userId)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(e))
 
 
 
@@ -201,23 +292,56 @@ def cancel_ride_route(
 # get rides based on specified filters
 # ---------------------------------------------------
 @router.get("/filtered-rides") 
-def list_rides_route(
+async def list_rides_route(
     status: Optional[RideStatus] = None,
     hosted_by_me: bool = False,
     participating: bool = False,
     available: bool = False,
-    skip: int = 0,
-    limit: int = 20,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
 ):
-    return list_rides(
-        db=db,
-        requester_id=current_user.userId,
+    try:
+        return json_response(await list_rides(
+            db=db,
+            requester_id=current_user.userId,
+            status=status,
+            hosted_by_me=hosted_by_me,
+            participating=participating,
+            available=available,
+            q=q,
+            cursor=cursor,
+            limit=limit,
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ---------------------------------------------------
+# search rides by name / start / end (same filters)
+# ---------------------------------------------------
+@router.get("/rides/search")
+async def search_rides_route(
+    q: str,
+    status: Optional[RideStatus] = None,
+    hosted_by_me: bool = False,
+    participating: bool = False,
+    available: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+):
+    return await list_rides_route(
         status=status,
         hosted_by_me=hosted_by_me,
         participating=participating,
         available=available,
-        skip=skip,
+        q=q,
+        cursor=cursor,
         limit=limit,
+        current_user=current_user,
+        db=db,
     )
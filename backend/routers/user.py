@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from db.dependencies import get_db
 from models.user import SignupUser, EditUser
 from services.user import create_user, edit_user_info, get_all_users, delete_user
-from routers.auth import get_current_active_user, get_current_user_from_token, oauth2_scheme
+from routers.auth import get_current_active_user, get_current_user_from_token, oauth2_scheme, too_many_logins
+from services.password import HashingPoolSaturated
 from fastapi.security import OAuth2PasswordBearer
 
 router = APIRouter(tags=["users"])
@@ -27,19 +28,19 @@ async def read_users_me(
 # edit current user
 #-------------------
 @router.put("/edit-user/me")
-def edit_profile(
+async def edit_profile(
     user: EditUser,
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    current_user = get_current_user_from_token(db, token)
+    current_user = await get_current_user_from_token(db, token)
 
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
-    updated_user = edit_user_info(
+    updated_user = await edit_user_info(
         db=db,
         username=current_user.username,
         name=user.name,
@@ -55,11 +56,11 @@ def edit_profile(
 #----------------------
 
 @router.delete("/delete-user/me")
-def delete_account(
+async def delete_account(
     current_user = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    success = delete_user(db, current_user.username)
+    success = await delete_user(db, current_user.username)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -72,9 +73,9 @@ def delete_account(
 # signup new user
 #---------------------
 @router.post("/signup")
-def signup(user: SignupUser, db: Session = Depends(get_db)):
+async def signup(user: SignupUser, db: AsyncSession = Depends(get_db)):
     try:
-        user = create_user(
+        user = await create_user(
             db=db,
             username=user.username,
             name=user.name,
@@ -86,6 +87,8 @@ def signup(user: SignupUser, db: Session = Depends(get_db)):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e),
         )
+    except HashingPoolSaturated:
+        raise too_many_logins()
     return {
         "userId": str(user.userId),
         "username": user.username,
@@ -98,10 +101,10 @@ def signup(user: SignupUser, db: Session = Depends(get_db)):
 # get all user from the DB
 #---------------------------
 @router.get("/users")
-def list_all_users(
-    db: Session = Depends(get_db),
+async def list_all_users(
+    db: AsyncSession = Depends(get_db),
 ):
-    users = get_all_users(db)
+    users = await get_all_users(db)
 
     return [
         {
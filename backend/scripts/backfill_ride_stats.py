@@ -0,0 +1,49 @@
+"""Fill rides.rideDuration/haltDuration from recorded tracks.
+
+    python -m scripts.backfill_ride_stats                 # completed rides still missing them
+    python -m scripts.backfill_ride_stats --ride <id>     # one ride, overwriting
+"""
+import argparse
+import asyncio
+import uuid
+
+from sqlalchemy import exists, select
+
+from db.database import get_async_session_local, dispose_async_engine
+from db.models import Ride, RideStatus, RideTrackChunk
+from services.track import backfill_ride_durations
+
+
+async def main(ride_id) -> int:
+    SessionLocal = get_async_session_local()
+    try:
+        async with SessionLocal() as db:
+            if ride_id is not None:
+                ride_ids = [ride_id]
+            else:
+                ride_ids = (await db.execute(
+                    select(Ride.rideId).where(
+                        Ride.status == RideStatus.COMPLETED,
+                        Ride.rideDuration.is_(None),
+                        exists().where(RideTrackChunk.rideId == Ride.rideId),
+                    )
+                )).scalars().all()
+
+            for rid in ride_ids:
+                stats = await backfill_ride_durations(db, rid)
+                if stats is None:
+                    print(f"{rid}: no track recorded")
+                else:
+                    print(f"{rid}: ride={stats['durationHours']}h halt={stats['haltHours']}h "
+                          f"distance={stats['distanceKm']}km")
+            print(f"{len(ride_ids)} ride(s) processed")
+        return 0
+    finally:
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ride", type=uuid.UUID, help="only this ride")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.ride)))
@@ -0,0 +1,100 @@
+"""Compare full ORM hydration against the projected read queries for listings.
+
+The "orm" path is the previous implementation (selectinload of Ride, host,
+participants and their users); "projected" is what the services run now.
+Both render the same payload. Needs a migrated Postgres in DATABASE_URL.
+
+    python -m scripts.bench_ride_reads --rides 20000 --limit 100
+    python -m scripts.bench_ride_reads --rides 0       # use existing data only
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from db.database import get_async_session_local, dispose_async_engine
+from db.models import Ride, RideParticipant
+from scripts.explain_queries import seed, cleanup
+from services import ride as ride_service
+from services.serializers import participant_groups, ride_payload
+
+
+async def orm_rides(db, limit: int):
+    stmt = (
+        select(Ride)
+        .options(
+            selectinload(Ride.host),
+            selectinload(Ride.participants).selectinload(RideParticipant.user),
+        )
+        .order_by(Ride.rideStartTime, Ride.rideId)
+        .limit(limit)
+    )
+    rides = (await db.execute(stmt)).scalars().all()
+    return [
+        ride_payload(
+            ride,
+            ride.host.username,
+            participant_groups((p.userId, p.user.username, p.status) for p in ride.participants),
+        )
+        for ride in rides
+    ]
+
+
+async def projected_rides(db, limit: int):
+    items, _ = await ride_service.get_all_rides(db, limit=limit)
+    return items
+
+
+async def measure(SessionLocal, load, limit: int, iterations: int) -> dict:
+    timings, peaks = [], []
+    for _ in range(iterations):
+        async with SessionLocal() as db:
+            tracemalloc.start()
+            started = time.perf_counter()
+            items = await load(db, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+    return {
+        "items": len(items),
+        "mean_ms": statistics.mean(timings),
+        "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1],
+        "peak_kib": statistics.mean(peaks),
+    }
+
+
+async def main(rides: int, limit: int, iterations: int, keep: bool) -> int:
+    try:
+        if rides:
+            print(f"seeding {rides} rides ...")
+            await seed(rides)
+
+        SessionLocal = get_async_session_local()
+        # warm the pool and statement caches before timing anything
+        for load in (orm_rides, projected_rides):
+            await measure(SessionLocal, load, limit, 2)
+
+        print(f"limit={limit} iterations={iterations}")
+        for name, load in (("orm", orm_rides), ("projected", projected_rides)):
+            r = await measure(SessionLocal, load, limit, iterations)
+            print(f"{name:>10}: items={r['items']} mean={r['mean_ms']:.2f}ms "
+                  f"p95={r['p95_ms']:.2f}ms peak={r['peak_kib']:.0f}KiB")
+        return 0
+    finally:
+        if rides and not keep:
+            await cleanup()
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rides", type=int, default=20000, help="rides to seed (0 = use existing data)")
+    parser.add_argument("--limit", type=int, default=100, help="page size")
+    parser.add_argument("--iterations", type=int, default=50, help="timed runs per path")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.rides, args.limit, args.iterations, args.keep)))
@@ -0,0 +1,177 @@
+"""EXPLAIN ANALYZE every query the ride services issue, against seeded data.
+
+Runs the real service functions, captures the SQL they send, and replays
+each SELECT under EXPLAIN (ANALYZE, BUFFERS) so index usage can be
+checked after schema changes. Needs a migrated Postgres in DATABASE_URL.
+
+    python -m scripts.explain_queries --rides 50000
+    python -m scripts.explain_queries --rides 0       # use existing data only
+"""
+import argparse
+import asyncio
+import re
+
+from sqlalchemy import event, select, text
+
+from db.database import get_async_engine, get_async_session_local, dispose_async_engine
+from db.models import Ride, RideParticipant, ParticipantStatus, RideStatus
+from services import ride as ride_service
+from services import comment as comment_service
+
+SEED_PREFIX = "explain-"
+INDEX_RE = re.compile(r"Index (?:Only )?Scan (?:Backward )?(?:using|on) (\w+)")
+
+
+# -------------------------
+# Seed data
+# -------------------------
+SEED_SQL = [
+    """
+    INSERT INTO users ("userId", username, name, "passwordHash", "bikeName", "createdAt")
+    SELECT gen_random_uuid(), :prefix || g, 'seed', '-', '-', now()
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO rides ("rideId", "createdAt", "hostId", "rideName", "rideStartTime",
+                       "rideStartPoint", "rideEndPoint", "routeLink", "maxParticipants",
+                       status, "approvedCount")
+    SELECT gen_random_uuid(), now(), u."userId", 'seed ride ' || g,
+           now() + (random() * 730 - 700) * interval '1 day',
+           'start', 'end', '', 20,
+           (ARRAY['UPCOMING','ONGOING','COMPLETED','CANCELLED']::ride_status[])[1 + (g % 20 = 0)::int + (g % 20 > 1)::int * 2],
+           0
+    FROM generate_series(1, :rides) g
+    JOIN LATERAL (
+        SELECT "userId" FROM users WHERE username = :prefix || (1 + g % :users)
+    ) u ON true
+    """,
+    """
+    INSERT INTO ride_participants ("rideId", "userId", status, "requestedAt")
+    SELECT r."rideId", u."userId",
+           (ARRAY['PENDING','APPROVED','REJECTED']::participant_status[])[1 + (r.rn + k) % 3],
+           now()
+    FROM (
+        SELECT "rideId", "hostId", row_number() OVER () AS rn
+        FROM rides WHERE "rideName" LIKE 'seed ride %'
+    ) r
+    CROSS JOIN generate_series(1, 4) k
+    JOIN users u ON u.username = :prefix || (1 + (r.rn * 7 + k * 131) % :users)
+    WHERE u."userId" <> r."hostId"
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    UPDATE rides r SET "approvedCount" = (
+        SELECT count(*) FROM ride_participants p
+        WHERE p."rideId" = r."rideId" AND p.status = 'APPROVED'
+    )
+    WHERE r."rideName" LIKE 'seed ride %'
+    """,
+    "ANALYZE users",
+    "ANALYZE rides",
+    "ANALYZE ride_participants",
+]
+
+
+async def seed(rides: int):
+    users = max(rides // 20, 50)
+    async with get_async_engine().begin() as conn:
+        for sql in SEED_SQL:
+            await conn.execute(text(sql), {"prefix": SEED_PREFIX, "users": users, "rides": rides})
+
+
+async def cleanup():
+    async with get_async_engine().begin() as conn:
+        await conn.execute(text("DELETE FROM users WHERE username LIKE :p"), {"p": SEED_PREFIX + "%"})
+
+
+# -------------------------
+# Capture + explain
+# -------------------------
+def service_calls(db, ride_id, host_id, member_id):
+    return [
+        ("get_all_rides", lambda: ride_service.get_all_rides(db)),
+        ("get_upcoming_rides", lambda: ride_service.get_upcoming_rides(db)),
+        ("get_ride_details", lambda: ride_service.get_ride_details(db, ride_id=ride_id, requester_id=host_id)),
+        ("list_rides", lambda: ride_service.list_rides(db, requester_id=host_id)),
+        ("list_rides status", lambda: ride_service.list_rides(db, requester_id=host_id, status=RideStatus.UPCOMING)),
+        ("list_rides hosted_by_me", lambda: ride_service.list_rides(db, requester_id=host_id, hosted_by_me=True)),
+        ("list_rides participating", lambda: ride_service.list_rides(db, requester_id=member_id, participating=True)),
+        ("list_rides available", lambda: ride_service.list_rides(db, requester_id=host_id, available=True)),
+        ("list_rides q", lambda: ride_service.list_rides(db, requester_id=host_id, q="ride 123")),
+        ("list_rides q rare", lambda: ride_service.list_rides(db, requester_id=host_id, q="19999")),
+        ("list_rides q status", lambda: ride_service.list_rides(db, requester_id=host_id, q="ride 123", status=RideStatus.UPCOMING)),
+        ("list_comments", lambda: comment_service.list_comments(db, ride_id=ride_id, requester_id=host_id)),
+    ]
+
+
+async def capture(db):
+    """Run each service call once and record the SELECTs it sends."""
+    sample = (await db.execute(
+        select(Ride.rideId, Ride.hostId).where(Ride.status == RideStatus.UPCOMING).limit(1)
+    )).first()
+    member_id = (await db.execute(
+        select(RideParticipant.userId).where(RideParticipant.status == ParticipantStatus.APPROVED).limit(1)
+    )).scalar()
+    if sample is None or member_id is None:
+        raise SystemExit("no data to explain; run with --rides N to seed")
+
+    captured = []
+    current = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            current.append((statement, parameters))
+
+    sync_engine = get_async_engine().sync_engine
+    event.listen(sync_engine, "before_cursor_execute", record)
+    try:
+        for name, call in service_calls(db, sample.rideId, sample.hostId, member_id):
+            current.clear()
+            await call()
+            for n, (statement, parameters) in enumerate(current, 1):
+                label = name if len(current) == 1 else f"{name} [{n}/{len(current)}]"
+                captured.append((label, statement, parameters))
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", record)
+    return captured
+
+
+async def explain(db, statement, parameters):
+    conn = await db.connection()
+    result = await conn.exec_driver_sql(
+        "EXPLAIN (ANALYZE, BUFFERS) " + statement, parameters
+    )
+    return [row[0] for row in result]
+
+
+async def main(rides: int, keep: bool, verbose: bool) -> int:
+    try:
+        if rides:
+            print(f"seeding {rides} rides ...")
+            await seed(rides)
+
+        SessionLocal = get_async_session_local()
+        async with SessionLocal() as db:
+            for name, statement, parameters in await capture(db):
+                plan = await explain(db, statement, parameters)
+                indexes = sorted(set(INDEX_RE.findall("\n".join(plan))))
+                timing = next((line for line in plan if line.startswith("Execution Time")), "")
+                seq = any("Seq Scan" in line for line in plan)
+                print(f"\n== {name}: {timing.strip()}")
+                print(f"   indexes: {', '.join(indexes) or '-'}{'   (has Seq Scan)' if seq else ''}")
+                if verbose:
+                    print("\n".join("   " + line for line in plan))
+        return 0
+    finally:
+        if rides and not keep:
+            await cleanup()
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rides", type=int, default=20000, help="rides to seed (0 = use existing data)")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded rows")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print full plans")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.rides, args.keep, args.verbose)))
@@ -0,0 +1,34 @@
+"""Check rides.approvedCount against ride_participants and optionally fix it.
+
+    python -m scripts.repair_approved_counts          # report drift
+    python -m scripts.repair_approved_counts --fix    # rewrite drifted rows
+"""
+import argparse
+import asyncio
+
+from db.database import get_async_session_local, dispose_async_engine
+from services.ride import check_approved_counts, repair_approved_counts
+
+
+async def main(fix: bool) -> int:
+    SessionLocal = get_async_session_local()
+    try:
+        async with SessionLocal() as db:
+            drifted = await check_approved_counts(db)
+            for row in drifted:
+                print(f"{row['rideId']}: stored={row['approvedCount']} actual={row['actual']}")
+            print(f"{len(drifted)} ride(s) out of sync")
+
+            if fix and drifted:
+                fixed = await repair_approved_counts(db)
+                print(f"repaired {fixed} ride(s)")
+        return 1 if drifted and not fix else 0
+    finally:
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="rewrite drifted counters")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.fix)))
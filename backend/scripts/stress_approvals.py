@@ -0,0 +1,102 @@
+"""Fire concurrent approvals at one ride and check capacity is never exceeded.
+
+Needs a migrated Postgres in DATABASE_URL; seeds its own users and ride
+and deletes them afterwards.
+
+    python -m scripts.stress_approvals --requests 300 --capacity 25
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+
+from db.database import get_async_session_local, dispose_async_engine
+from db.models import User, Ride, RideParticipant, RideStatus, ParticipantStatus
+from services.ride import decide_participation
+
+
+async def seed(SessionLocal, requests: int, capacity: int):
+    tag = uuid.uuid4().hex[:8]
+    host = User(
+        userId=uuid.uuid4(), username=f"stress-host-{tag}", name="stress",
+        passwordHash="-", bikeName="-",
+    )
+    riders = [
+        User(
+            userId=uuid.uuid4(), username=f"stress-{tag}-{i}", name="stress",
+            passwordHash="-", bikeName="-",
+        )
+        for i in range(requests)
+    ]
+    ride = Ride(
+        rideId=uuid.uuid4(), hostId=host.userId, rideName=f"stress {tag}",
+        rideStartTime=datetime.now(timezone.utc) + timedelta(days=1),
+        rideStartPoint="-", rideEndPoint="-", routeLink="",
+        maxParticipants=capacity, status=RideStatus.UPCOMING,
+    )
+    async with SessionLocal() as db:
+        db.add_all([host, *riders])
+        await db.flush()
+        db.add(ride)
+        await db.flush()
+        db.add_all([
+            RideParticipant(rideId=ride.rideId, userId=r.userId, status=ParticipantStatus.PENDING)
+            for r in riders
+        ])
+        await db.commit()
+    return host, riders, ride
+
+
+async def approve(SessionLocal, host, ride, rider) -> bool:
+    async with SessionLocal() as db:
+        try:
+            await decide_participation(
+                db=db, host_id=host.userId, ride_id=ride.rideId,
+                participant_user_id=rider.userId, approve=True,
+            )
+            return True
+        except ValueError:
+            return False
+
+
+async def main(requests: int, capacity: int, repeat: int) -> int:
+    SessionLocal = get_async_session_local()
+    host, riders, ride = await seed(SessionLocal, requests, capacity)
+    try:
+        # every rider approved `repeat` times at once, e.g. two host tabs
+        attempts = [approve(SessionLocal, host, ride, r) for r in riders for _ in range(repeat)]
+        results = await asyncio.gather(*attempts)
+
+        async with SessionLocal() as db:
+            stored = (await db.execute(
+                select(Ride.approvedCount).where(Ride.rideId == ride.rideId)
+            )).scalar_one()
+            actual = (await db.execute(
+                select(func.count()).where(
+                    RideParticipant.rideId == ride.rideId,
+                    RideParticipant.status == ParticipantStatus.APPROVED,
+                )
+            )).scalar_one()
+
+        expected = min(requests, capacity)
+        print(f"attempts={len(attempts)} succeeded={sum(results)} "
+              f"approvedCount={stored} approved_rows={actual} expected={expected}")
+        ok = stored == actual == sum(results) == expected
+        print("OK" if ok else "FAILED: capacity invariant violated")
+        return 0 if ok else 1
+    finally:
+        async with SessionLocal() as db:
+            await db.execute(delete(User).where(User.userId.in_([host.userId, *(r.userId for r in riders)])))
+            await db.commit()
+        await dispose_async_engine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300, help="pending join requests to approve")
+    parser.add_argument("--capacity", type=int, default=25, help="ride maxParticipants")
+    parser.add_argument("--repeat", type=int, default=2, help="concurrent approvals per request")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(main(args.requests, args.capacity, args.repeat)))
@@ -1,10 +1,14 @@
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import jwt
 from jwt.exceptions import InvalidTokenError
-from pwdlib import PasswordHash
-from sqlalchemy.orm import Session
-from db.models import User
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.models import User, UserTokenVersion
+from services.password import verify_password
+from services.cache import TTLCache
+from websocket_manager import manager
 from dotenv import load_dotenv
 import os
 
@@ -13,38 +17,100 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-password_hash = PasswordHash.recommended()
+# -------------------------
+# Auth caches
+# -------------------------
+# token -> claims, username -> User and userId -> token version, so a
+# protected request skips the JWT verify and the SELECTs while fresh
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+
+token_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+version_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+
+
+def _drop_cached_user(data: dict):
+    user_cache.pop(data["username"])
+    if data.get("userId"):
+        version_cache.pop(uuid.UUID(data["userId"]))
+
+manager.on_event("auth.invalidate_user", _drop_cached_user)
+
+
+async def invalidate_user(username: str, user_id: Optional[uuid.UUID] = None):
+    """Forget a cached user on every worker (after edit/delete/revoke)."""
+    data = {"username": username, "userId": str(user_id) if user_id else None}
+    _drop_cached_user(data)
+    await manager.publish_event("auth.invalidate_user", data)
+
+
+def get_cache_stats() -> dict:
+    return {
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+        "token_versions": version_cache.stats(),
+    }
 
 
 # -------------------------
-# Password Utilities
+# Principal
 # -------------------------
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return password_hash.verify(plain_password, hashed_password)
-
+class Principal:
+    """Caller identity taken from the token; no ORM object, no DB row."""
 
-def get_password_hash(password: str) -> str:
-    return password_hash.hash(password)
+    __slots__ = ("userId", "username", "tokenVersion")
 
+    def __init__(self, userId: uuid.UUID, username: str, tokenVersion: Optional[int]):
+        self.userId = userId
+        self.username = username
+        self.tokenVersion = tokenVersion
 
 # -------------------------
 # DB Access
 # -------------------------
 
-def get_user(db: Session, username: str) -> Optional[User]:
-    return db.query(User).filter(User.username == username).first()
+async def get_user(db: AsyncSession, username: str) -> Optional[User]:
+    stmt = select(User).where(User.username == username)
+    return (await db.execute(stmt)).scalar_one_or_none()
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    user = get_user(db, username)
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    user = await get_user(db, username)
     if not user:
         return None
-    if not verify_password(password, user.passwordHash):
+    valid, updated_hash = await verify_password(password, user.passwordHash)
+    if not valid:
         return None
+    # Argon2 parameters changed since this hash was made: upgrade it
+    if updated_hash:
+        user.passwordHash = updated_hash
+        await db.commit()
     return user
 
 
+async def get_token_version(db: AsyncSession, user_id: uuid.UUID) -> int:
+    """Current token version; 0 when the user no longer exists."""
+    version = version_cache.get(user_id)
+    if version is None:
+        stmt = select(UserTokenVersion.version).where(UserTokenVersion.userId == user_id)
+        version = (await db.execute(stmt)).scalar_one_or_none() or 0
+        version_cache.set(user_id, version)
+    return version
+
+
+async def revoke_tokens(db: AsyncSession, user: User):
+    """Invalidate every access token issued to this user so far."""
+    await db.execute(
+        update(UserTokenVersion)
+        .where(UserTokenVersion.userId == user.userId)
+        .values(version=UserTokenVersion.version + 1)
+    )
+    await db.commit()
+    await invalidate_user(user.username, user.userId)
+
+
 # -------------------------
 # JWT Utilities
 # -------------------------
@@ -64,16 +130,67 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta]=None) ->
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def decode_token(token: str) -> Optional[str]:
+async def issue_access_token(
+    db: AsyncSession,
+    user: User,
+    expires_delta: Optional[timedelta] = None,
+) -> str:
+    version = await get_token_version(db, user.userId)
+    return create_access_token(
+        data={"sub": user.username, "uid": str(user.userId), "ver": version},
+        expires_delta=expires_delta,
+    )
+
+
+def decode_claims(token: str) -> Optional[dict]:
+    claims = token_cache.get(token)
+    if claims is not None:
+        if claims["exp"] > datetime.now(timezone.utc).timestamp():
+            return claims
+        token_cache.pop(token)
+        return None
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload.get("sub")
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except InvalidTokenError:
         return None
+    if claims.get("sub") is None:
+        return None
+    token_cache.set(token, claims)
+    return claims
+
+
+def decode_token(token: str) -> Optional[str]:
+    claims = decode_claims(token)
+    return claims["sub"] if claims else None
+
+
+async def _get_cached_user(db: AsyncSession, username: str) -> Optional[User]:
+    user = user_cache.get(username)
+    if user is None:
+        user = await get_user(db, username)
+        if user is not None:
+            user_cache.set(username, user)
+    return user
+
+
+async def get_principal_from_token(db: AsyncSession, token: str) -> Optional[Principal]:
+    claims = decode_claims(token)
+    if not claims:
+        return None
+
+    # tokens from before ids were embedded: resolve by username until they expire
+    if "uid" not in claims:
+        user = await _get_cached_user(db, claims["sub"])
+        return Principal(user.userId, user.username, None) if user else None
+
+    user_id = uuid.UUID(claims["uid"])
+    if claims.get("ver") != await get_token_version(db, user_id):
+        return None
+    return Principal(user_id, claims["sub"], claims["ver"])
 
 
-def get_current_user_from_token(db: Session, token: str) -> Optional[User]:
-    username = decode_token(token)
-    if not username:
+async def get_current_user_from_token(db: AsyncSession, token: str) -> Optional[User]:
+    principal = await get_principal_from_token(db, token)
+    if principal is None:
         return None
-    return get_user(db, username)
+    return await _get_cached_user(db, principal.username)
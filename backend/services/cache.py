@@ -0,0 +1,86 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Small in-process LRU cache whose entries also expire after `ttl` seconds.
+
+    Not thread-safe; it is only used from the event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class ResponseCache:
+    """Rendered response bodies with ETags, dropped wholesale on invalidate().
+
+    A body is only stored if no invalidation happened while it was being
+    built, so a slow render can't put a stale page back after a write.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        return self._entries.get(key)
+
+    def set(self, key: Hashable, body: bytes, generation: int) -> tuple:
+        entry = (body, '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest())
+        if generation == self.generation:
+            self._entries.set(key, entry)
+        return entry
+
+    def invalidate(self):
+        self.generation += 1
+        self._entries.clear()
+
+    def discard(self, *keys: Hashable):
+        """Drop just these entries (still fences off in-flight renders)."""
+        self.generation += 1
+        for key in keys:
+            self._entries.pop(key)
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "generation": self.generation}
@@ -0,0 +1,108 @@
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Comment, Ride, RideParticipant, ParticipantStatus, User
+from services.pagination import DEFAULT_PAGE_SIZE, clamp_limit, before_cursor, split_page
+from services.serializers import page_payload
+from services.notification import notify, notification_dispatcher
+
+
+# -------------------------
+# Ride members
+# -------------------------
+# The host plus everyone approved or still waiting; they can read and post
+# in the thread and get new comments live over /ws.
+async def _ride_members(db: AsyncSession, ride_id) -> set:
+    stmt = select(Ride.hostId).where(Ride.rideId == ride_id).union_all(
+        select(RideParticipant.userId).where(
+            RideParticipant.rideId == ride_id,
+            RideParticipant.status.in_([ParticipantStatus.APPROVED, ParticipantStatus.PENDING]),
+        )
+    )
+    members = set((await db.execute(stmt)).scalars().all())
+    # the host row is always there for an existing ride
+    if not members:
+        raise ValueError("Ride not found")
+    return members
+
+
+async def _check_member(db: AsyncSession, ride_id, user_id) -> set:
+    members = await _ride_members(db, ride_id)
+    if user_id not in members:
+        raise PermissionError("Only ride members can see or post comments")
+    return members
+
+
+# -------------------------
+# post a comment
+# -------------------------
+async def create_comment(
+    db: AsyncSession,
+    ride_id: uuid.UUID,
+    user_id: uuid.UUID,
+    username: str,
+    text: str,
+):
+    members = await _check_member(db, ride_id, user_id)
+
+    comment = Comment(
+        commentId=uuid.uuid4(),
+        rideId=ride_id,
+        userId=user_id,
+        commentText=text,
+        createdAt=datetime.now(timezone.utc),
+    )
+    db.add(comment)
+
+    payload = {
+        "commentId": str(comment.commentId),
+        "rideId": str(ride_id),
+        "userId": str(user_id),
+        "username": username,
+        "commentText": text,
+        "createdAt": comment.createdAt.isoformat(),
+    }
+    # the author's own client has the comment from this response
+    await notify(db, members - {user_id}, {"type": "NEW_COMMENT", "comment": payload})
+    await db.commit()
+    notification_dispatcher.wake()
+    return payload
+
+
+# -------------------------
+# read a thread, newest first
+# -------------------------
+async def list_comments(
+    db: AsyncSession,
+    ride_id: uuid.UUID,
+    requester_id: uuid.UUID,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    limit = clamp_limit(limit)
+    await _check_member(db, ride_id, requester_id)
+
+    stmt = (
+        select(
+            Comment.commentId,
+            Comment.rideId,
+            Comment.userId,
+            User.username,
+            Comment.commentText,
+            Comment.createdAt,
+        )
+        .join(User, User.userId == Comment.userId)
+        .where(Comment.rideId == ride_id)
+    )
+    before = before_cursor(Comment.createdAt, Comment.commentId, cursor)
+    if before is not None:
+        stmt = stmt.where(before)
+    stmt = stmt.order_by(Comment.createdAt.desc(), Comment.commentId.desc()).limit(limit + 1)
+
+    rows = (await db.execute(stmt)).mappings().all()
+    rows, next_cursor = split_page(rows, limit, lambda row: (row["createdAt"], row["commentId"]))
+    return page_payload([dict(row) for row in rows], next_cursor)
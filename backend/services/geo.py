@@ -0,0 +1,87 @@
+import math
+from typing import Set, Tuple
+
+# -------------------------
+# Geohash helpers
+# -------------------------
+# Rides store a geohash of their start/end point; a "near me" search turns
+# the circle into the 3x3 block of geohash cells around the centre, each of
+# which is one prefix range on a B-tree index, then filters by exact
+# distance.
+
+GEOHASH_PRECISION = 9  # ~5m cells; what gets stored
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # even bits are longitude
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value = value * 2 + 1
+                lon_lo = mid
+            else:
+                value *= 2
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value = value * 2 + 1
+                lat_lo = mid
+            else:
+                value *= 2
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """(lat degrees, lon degrees) spanned by one cell of this precision."""
+    lon_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _precision_for(lat: float, radius_km: float) -> int:
+    """Finest precision whose cells are still at least radius_km across."""
+    km_per_lat = math.pi * EARTH_RADIUS_KM / 180
+    km_per_lon = km_per_lat * max(math.cos(math.radians(lat)), 0.01)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = cell_size(precision)
+        if dlat * km_per_lat >= radius_km and dlon * km_per_lon >= radius_km:
+            return precision
+    return 1
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> Set[str]:
+    """Geohash prefixes whose union contains every point within radius_km."""
+    precision = _precision_for(lat, radius_km)
+    dlat, dlon = cell_size(precision)
+    cells = set()
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            cell_lat = min(max(lat + i * dlat, -90.0), 90.0)
+            cell_lon = (lon + j * dlon + 180.0) % 360.0 - 180.0
+            cells.add(encode(cell_lat, cell_lon, precision))
+    return cells
@@ -0,0 +1,315 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+
+from db.database import get_async_session_local
+from db.models import Ride, RideParticipant, RideStatus, ParticipantStatus
+from services.cache import TTLCache
+from services.track import TRACK_FLUSH_INTERVAL, save_fixes
+from websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Live location (env)
+# -------------------------
+# Riders on an ONGOING ride send {"type": "LOCATION", "rideId", "lat", "lon",
+# "ts"?} over /ws. Fixes are coalesced per rider (latest wins) and every
+# tick each worker publishes one LOCATION_BATCH per active ride to the
+# ride's members, instead of relaying every fix to every rider. Every
+# accepted fix is also buffered and written to the track store
+# (services/track.py) every TRACK_FLUSH_INTERVAL seconds.
+LOCATION_TICK = float(os.getenv("LOCATION_TICK", "1.0"))
+# fixes closer together than this from one rider are dropped on arrival
+LOCATION_MIN_INTERVAL = float(os.getenv("LOCATION_MIN_INTERVAL", "0.5"))
+# positions per LOCATION_BATCH frame, keeps each publish under NOTIFY's limit
+LOCATION_BATCH_MAX = int(os.getenv("LOCATION_BATCH_MAX", "30"))
+# trackers with no fixes for this long are dropped
+LOCATION_IDLE_TTL = float(os.getenv("LOCATION_IDLE_TTL", "300"))
+# cap on fixes held for a ride while the database is unreachable
+TRACK_MAX_UNSAVED = int(os.getenv("TRACK_MAX_UNSAVED", "100000"))
+# client timestamps further than this from the server clock are replaced
+LOCATION_MAX_CLOCK_SKEW_MS = 5 * 60 * 1000
+# LOCATION frames per second one socket may send (burst of twice that);
+# checked before the membership lookup so junk rideIds can't hammer the DB
+LOCATION_CLIENT_RATE = float(os.getenv("LOCATION_CLIENT_RATE", "4"))
+
+# who may stream/receive positions for a ride; None = ride not ONGOING
+_members: TTLCache = TTLCache(maxsize=10000, ttl=30)
+
+
+class Fix(NamedTuple):
+    user_id: str
+    lat: float
+    lon: float
+    ts: int  # epoch milliseconds
+
+
+class RideTracker:
+    """Positions for one ride on this worker."""
+
+    __slots__ = ("ride_id", "latest", "unsaved", "last_accepted", "last_fix_at")
+
+    def __init__(self, ride_id: str):
+        self.ride_id = ride_id
+        # rider -> newest fix not yet sent out
+        self.latest: Dict[str, Fix] = {}
+        # every accepted fix not yet written to the track store
+        self.unsaved: List[Fix] = []
+        self.last_accepted: Dict[str, float] = {}
+        self.last_fix_at = time.monotonic()
+
+    def add(self, fix: Fix) -> bool:
+        now = time.monotonic()
+        if now - self.last_accepted.get(fix.user_id, 0.0) < LOCATION_MIN_INTERVAL:
+            return False
+        self.last_accepted[fix.user_id] = now
+        self.last_fix_at = now
+        self.latest[fix.user_id] = fix
+        self.unsaved.append(fix)
+        return True
+
+    def take_latest(self) -> list:
+        fixes = list(self.latest.values())
+        self.latest.clear()
+        return fixes
+
+    def take_unsaved(self) -> list:
+        fixes, self.unsaved = self.unsaved, []
+        return fixes
+
+    def restore_unsaved(self, fixes: list):
+        """Put back fixes whose write failed, keeping the newest if over the cap."""
+        self.unsaved[:0] = fixes
+        del self.unsaved[:-TRACK_MAX_UNSAVED]
+
+
+class LocationHub:
+    def __init__(self):
+        self.trackers: Dict[str, RideTracker] = {}
+        self._ticker: Optional[asyncio.Task] = None
+        self._saver: Optional[asyncio.Task] = None
+        self.received = 0
+        self.dropped = 0
+        self.frames = 0
+        self.saved = 0
+
+    async def start(self):
+        self._ticker = asyncio.create_task(self._tick_loop())
+        self._saver = asyncio.create_task(self._save_loop())
+
+    async def stop(self):
+        for task in (self._ticker, self._saver):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._ticker = self._saver = None
+        await self.save()
+
+    def stats(self) -> dict:
+        return {
+            "rides": len(self.trackers),
+            "received": self.received,
+            "dropped": self.dropped,
+            "frames": self.frames,
+            "saved": self.saved,
+        }
+
+    # -------------------------
+    # ingest
+    # -------------------------
+    async def ingest(self, user_id: str, data: dict) -> bool:
+        """Accept one LOCATION message from a rider; False if it was dropped."""
+        self.received += 1
+        fix_ride = _parse(user_id, data)
+        if fix_ride is None:
+            self.dropped += 1
+            return False
+        ride_id, fix = fix_ride
+
+        members = await _ride_members(ride_id)
+        if members is None or user_id not in members:
+            self.dropped += 1
+            return False
+
+        tracker = self.trackers.get(ride_id)
+        if tracker is None:
+            tracker = self.trackers[ride_id] = RideTracker(ride_id)
+        if not tracker.add(fix):
+            self.dropped += 1
+            return False
+        return True
+
+    # -------------------------
+    # fan-out
+    # -------------------------
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(LOCATION_TICK)
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("location fan-out failed")
+
+    async def flush(self):
+        """Publish the coalesced positions of every ride with new fixes."""
+        now = time.monotonic()
+        for ride_id, tracker in list(self.trackers.items()):
+            fixes = tracker.take_latest()
+            if not fixes:
+                if now - tracker.last_fix_at > LOCATION_IDLE_TTL and not tracker.unsaved:
+                    del self.trackers[ride_id]
+                continue
+            members = await _ride_members(ride_id)
+            if not members:
+                continue
+            for start in range(0, len(fixes), LOCATION_BATCH_MAX):
+                await manager.broadcast(members, {
+                    "type": "LOCATION_BATCH",
+                    "rideId": ride_id,
+                    "positions": [
+                        {"userId": f.user_id, "lat": f.lat, "lon": f.lon, "ts": f.ts}
+                        for f in fixes[start:start + LOCATION_BATCH_MAX]
+                    ],
+                })
+                self.frames += 1
+
+    # -------------------------
+    # persistence
+    # -------------------------
+    async def _save_loop(self):
+        while True:
+            await asyncio.sleep(TRACK_FLUSH_INTERVAL)
+            await self.save()
+
+    async def save(self):
+        """Write buffered fixes to the track store, one chunk per rider."""
+        SessionLocal = get_async_session_local()
+        for tracker in list(self.trackers.values()):
+            fixes = tracker.take_unsaved()
+            if not fixes:
+                continue
+            try:
+                async with SessionLocal() as db:
+                    await save_fixes(db, tracker.ride_id, fixes)
+                self.saved += len(fixes)
+            except Exception:
+                logger.exception("saving track of ride %s failed", tracker.ride_id)
+                tracker.restore_unsaved(fixes)
+
+
+def _parse(user_id: str, data: dict):
+    """(rideId, Fix) from a LOCATION message, or None if it is malformed."""
+    try:
+        ride_id = str(uuid.UUID(str(data["rideId"])))
+        lat = round(float(data["lat"]), 6)
+        lon = round(float(data["lon"]), 6)
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    now_ms = int(time.time() * 1000)
+    ts = data.get("ts")
+    # NaN would slip past the skew check and fail in int()
+    if (
+        not isinstance(ts, (int, float))
+        or not math.isfinite(ts)
+        or abs(ts - now_ms) > LOCATION_MAX_CLOCK_SKEW_MS
+    ):
+        ts = now_ms
+    return ride_id, Fix(user_id, lat, lon, int(ts))
+
+
+async def _ride_members(ride_id: str) -> Optional[frozenset]:
+    """Host + approved riders of an ONGOING ride (cached), else None."""
+    members = _members.get(ride_id, False)
+    if members is not False:
+        return members
+
+    approved = (
+        select(func.array_agg(RideParticipant.userId))
+        .where(
+            RideParticipant.rideId == Ride.rideId,
+            RideParticipant.status == ParticipantStatus.APPROVED,
+        )
+        .correlate(Ride)
+        .scalar_subquery()
+    )
+    stmt = select(Ride.hostId, approved).where(
+        Ride.rideId == ride_id,
+        Ride.status == RideStatus.ONGOING,
+    )
+    SessionLocal = get_async_session_local()
+    async with SessionLocal() as db:
+        row = (await db.execute(stmt)).first()
+
+    members = None
+    if row is not None:
+        host_id, approved_ids = row
+        members = frozenset(str(u) for u in [host_id, *(approved_ids or ())])
+    _members.set(ride_id, members)
+    return members
+
+
+def _on_rides_changed(data: dict):
+    ride_id = data.get("rideId")
+    if ride_id is None:
+        _members.clear()
+    else:
+        _members.pop(ride_id)
+
+manager.on_event("rides.changed", _on_rides_changed)
+
+
+class ClientRateLimit:
+    """Token bucket for the LOCATION frames of one socket."""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self):
+        self.tokens = LOCATION_CLIENT_RATE * 2
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        self.tokens = min(LOCATION_CLIENT_RATE * 2, self.tokens + (now - self.updated) * LOCATION_CLIENT_RATE)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+async def handle_client_message(user_id: str, text: str, rate: ClientRateLimit):
+    """Dispatch an inbound /ws frame; anything but LOCATION is ignored.
+
+    Never raises: a failed lookup drops the fix, it must not end the socket.
+    """
+    if '"LOCATION"' not in text:
+        return
+    if not rate.allow():
+        location_hub.dropped += 1
+        return
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return
+    if isinstance(data, dict) and data.get("type") == "LOCATION":
+        try:
+            await location_hub.ingest(user_id, data)
+        except Exception:
+            location_hub.dropped += 1
+            logger.exception("location fix from %s failed", user_id)
+
+
+location_hub = LocationHub()
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional
+
+import orjson
+from sqlalchemy import delete, func, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.database import get_async_session_local
+from db.models import Notification
+from services.serializers import render
+from websocket_manager import manager
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Notification outbox (env)
+# -------------------------
+# Services write a row per recipient with notify() before they commit, so a
+# notification exists iff the change it reports does. A dispatcher on every
+# worker claims undelivered rows (SKIP LOCKED, so workers never send the
+# same batch) and pushes them over /ws; clients that were offline get them
+# replayed on reconnect.
+#
+# Ids are taken at INSERT, before the writer commits, and concurrent
+# dispatchers may publish out of order, so ids do not arrive in order and
+# "everything above the last id" is not a safe replay cursor. Replay goes
+# by dispatch time instead (with an overlap) and clients de-duplicate
+# against the ids they have already seen.
+NOTIFICATION_POLL_INTERVAL = float(os.getenv("NOTIFICATION_POLL_INTERVAL", "1"))
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "200"))
+# newest notifications replayed on reconnect; older ones mean "reload".
+# Keep it below WS_SEND_QUEUE_SIZE, replay is queued in one go.
+NOTIFICATION_REPLAY_MAX = int(os.getenv("NOTIFICATION_REPLAY_MAX", "50"))
+NOTIFICATION_RETENTION_DAYS = float(os.getenv("NOTIFICATION_RETENTION_DAYS", "30"))
+NOTIFICATION_PURGE_INTERVAL = 3600
+# replay also resends what was dispatched this long before the client's
+# last notification; covers dispatchers whose batches overlapped in time
+NOTIFICATION_REPLAY_OVERLAP = float(os.getenv("NOTIFICATION_REPLAY_OVERLAP", "60"))
+
+
+async def notify(db: AsyncSession, user_ids: Iterable, message: dict):
+    """Queue `message` for each user in the caller's transaction.
+
+    Nothing is sent until the caller commits; call
+    notification_dispatcher.wake() afterwards to send it right away.
+    """
+    # UUIDs/datetimes -> JSON types, the same way responses render them
+    payload = orjson.loads(render(message))
+    rows = [
+        {"userId": uuid.UUID(user_id), "type": payload["type"], "payload": payload}
+        for user_id in dict.fromkeys(str(u) for u in user_ids)
+    ]
+    if rows:
+        await db.execute(insert(Notification), rows)
+
+
+def _frame(notification_id: int, payload: dict) -> dict:
+    return {**payload, "notificationId": notification_id}
+
+
+# -------------------------
+# Dispatcher
+# -------------------------
+class NotificationDispatcher:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self.dispatched = 0
+        self.batches = 0
+        self.purged = 0
+        self.oldest_pending_seconds = 0.0
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Dispatch now instead of at the next poll, e.g. right after a commit."""
+        self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "dispatched": self.dispatched,
+            "batches": self.batches,
+            "purged": self.purged,
+            # age of the oldest row in the last batch: how far behind we are
+            "oldest_pending_seconds": round(self.oldest_pending_seconds, 3),
+        }
+
+    async def _loop(self):
+        last_purge = 0.0
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), NOTIFICATION_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                while await self.dispatch() == NOTIFICATION_BATCH_SIZE:
+                    pass
+                if loop.time() - last_purge > NOTIFICATION_PURGE_INTERVAL:
+                    last_purge = loop.time()
+                    await self.purge()
+            except Exception:
+                logger.exception("notification dispatch failed")
+
+    async def dispatch(self) -> int:
+        """Send one batch of undelivered notifications; returns its size."""
+        SessionLocal = get_async_session_local()
+        async with SessionLocal() as db:
+            rows = (await db.execute(
+                select(
+                    Notification.notificationId,
+                    Notification.userId,
+                    Notification.payload,
+                    Notification.createdAt,
+                )
+                .where(Notification.dispatchedAt.is_(None))
+                .order_by(Notification.notificationId)
+                .limit(NOTIFICATION_BATCH_SIZE)
+                .with_for_update(skip_locked=True)
+            )).all()
+            if not rows:
+                self.oldest_pending_seconds = 0.0
+                return 0
+
+            # sent before the rows are marked: a failed commit means a
+            # resend, which clients drop by notificationId
+            await manager.broadcast_many(
+                ([row.userId], _frame(row.notificationId, row.payload)) for row in rows
+            )
+            await db.execute(
+                update(Notification)
+                .where(Notification.notificationId.in_([row.notificationId for row in rows]))
+                .values(dispatchedAt=func.now())
+            )
+            await db.commit()
+
+        self.dispatched += len(rows)
+        self.batches += 1
+        self.oldest_pending_seconds = (datetime.now(timezone.utc) - rows[0].createdAt).total_seconds()
+        return len(rows)
+
+    async def purge(self):
+        """Drop delivered notifications older than the retention period."""
+        cutoff = datetime.now(timezone.utc) - timedelta(days=NOTIFICATION_RETENTION_DAYS)
+        SessionLocal = get_async_session_local()
+        async with SessionLocal() as db:
+            result = await db.execute(
+                delete(Notification).where(
+                    Notification.createdAt < cutoff,
+                    Notification.dispatchedAt.is_not(None),
+                )
+            )
+            await db.commit()
+        self.purged += result.rowcount
+
+
+notification_dispatcher = NotificationDispatcher()
+
+
+# -------------------------
+# Replay and read state
+# -------------------------
+async def replay(db: AsyncSession, user_id, last_id: int) -> List[dict]:
+    """Frames for a reconnecting client, oldest first.
+
+    last_id is the last notification the client received. Everything
+    dispatched from NOTIFICATION_REPLAY_OVERLAP seconds before that one is
+    sent again, together with anything newer or still undispatched, so a
+    lower id that was committed or published late is not skipped; the
+    client drops the frames it already has by notificationId. Frames are
+    marked "replayed" so the client lists them without alerting again.
+
+    If more than NOTIFICATION_REPLAY_MAX qualify only the newest are
+    returned, preceded by a REPLAY_TRUNCATED frame telling the client to
+    reload what it shows.
+    """
+    missed = or_(Notification.notificationId > last_id, Notification.dispatchedAt.is_(None))
+    last_dispatched = (await db.execute(
+        select(Notification.dispatchedAt)
+        .where(Notification.userId == user_id, Notification.notificationId == last_id)
+    )).scalar_one_or_none()
+    if last_dispatched is not None:
+        since = last_dispatched - timedelta(seconds=NOTIFICATION_REPLAY_OVERLAP)
+        missed = or_(missed, Notification.dispatchedAt >= since)
+
+    rows = (await db.execute(
+        select(Notification.notificationId, Notification.payload)
+        .where(Notification.userId == user_id, missed)
+        .order_by(Notification.notificationId.desc())
+        .limit(NOTIFICATION_REPLAY_MAX + 1)
+    )).all()
+
+    frames = [
+        {**_frame(row.notificationId, row.payload), "replayed": True}
+        for row in reversed(rows[:NOTIFICATION_REPLAY_MAX])
+    ]
+    if len(rows) > NOTIFICATION_REPLAY_MAX:
+        frames.insert(0, {"type": "REPLAY_TRUNCATED"})
+    return frames
+
+
+async def unread_count(db: AsyncSession, user_id) -> int:
+    return (await db.execute(
+        select(func.count())
+        .select_from(Notification)
+        .where(Notification.userId == user_id, Notification.readAt.is_(None))
+    )).scalar_one()
+
+
+async def mark_read(db: AsyncSession, user_id, ids: Optional[List[int]] = None) -> int:
+    """Mark the given notifications of the user read, or all of them.
+
+    Takes the ids the client has actually shown rather than an "up to"
+    id: ids are not delivered in order, so a cut-off would also mark ones
+    that have not arrived yet.
+    """
+    stmt = (
+        update(Notification)
+        .where(Notification.userId == user_id, Notification.readAt.is_(None))
+        .values(readAt=func.now())
+    )
+    if ids is not None:
+        stmt = stmt.where(Notification.notificationId.in_(ids))
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
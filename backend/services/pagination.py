@@ -0,0 +1,63 @@
+import base64
+import json
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+
+# -------------------------
+# Cursor helpers
+# -------------------------
+# A cursor is the (timestamp, id) of the last row on a page, encoded as
+# url-safe base64 JSON so clients treat it as an opaque string.
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(ts: datetime, row_id: Any) -> str:
+    raw = json.dumps({"t": ts.isoformat(), "id": str(row_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(data["t"]), uuid.UUID(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("invalid cursor")
+
+
+def after_cursor(ts_column, id_column, cursor: Optional[str]):
+    """WHERE clause for rows strictly after the cursor, or None."""
+    if not cursor:
+        return None
+    ts, row_id = decode_cursor(cursor)
+    return tuple_(ts_column, id_column) > tuple_(ts, row_id)
+
+
+def before_cursor(ts_column, id_column, cursor: Optional[str]):
+    """Same, for newest-first pages: rows strictly before the cursor."""
+    if not cursor:
+        return None
+    ts, row_id = decode_cursor(cursor)
+    return tuple_(ts_column, id_column) < tuple_(ts, row_id)
+
+
+def split_page(
+    rows: Sequence[Any],
+    limit: int,
+    key: Callable[[Any], Tuple[datetime, Any]],
+) -> Tuple[List[Any], Optional[str]]:
+    """Trim a limit+1 fetch to one page and build the next cursor."""
+    items = list(rows[:limit])
+    if len(rows) <= limit:
+        return items, None
+    return items, encode_cursor(*key(items[-1]))
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+
+# -------------------------
+# Argon2 parameters (env)
+# -------------------------
+# Changing these is safe: existing hashes still verify and are upgraded
+# to the new parameters on the user's next successful login.
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))  # KiB
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+# -------------------------
+# Worker pool (env)
+# -------------------------
+# argon2-cffi releases the GIL while hashing, so threads run in parallel.
+# Each running hash holds ARGON2_MEMORY_COST of RAM, hence the small pool.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+password_hash = PasswordHash((
+    Argon2Hasher(
+        time_cost=ARGON2_TIME_COST,
+        memory_cost=ARGON2_MEMORY_COST,
+        parallelism=ARGON2_PARALLELISM,
+    ),
+))
+
+_executor = ThreadPoolExecutor(
+    max_workers=PASSWORD_HASH_WORKERS,
+    thread_name_prefix="argon2",
+)
+_pending = 0
+
+
+class HashingPoolSaturated(Exception):
+    """More hash/verify jobs are queued than PASSWORD_HASH_MAX_PENDING."""
+
+
+async def _run(fn, *args):
+    # only touched from the event loop thread, so a plain counter is enough
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HashingPoolSaturated("too many password operations in progress")
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run(password_hash.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Return (valid, new_hash); new_hash is set when parameters changed."""
+    return await _run(password_hash.verify_and_update, password, hashed_password)
+
+
+def get_pool_stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "pending": _pending,
+        "max_pending": PASSWORD_HASH_MAX_PENDING,
+    }
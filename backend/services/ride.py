@@ -2,18 +2,84 @@ from datetime import datetime, timezone
 from db.models import Ride, RideStatus
 import uuid
 from models.ride import Ride as RideSchema
-from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
 from datetime import datetime, timezone
-from db.models import Ride, RideParticipant, RideStatus, ParticipantStatus
-from sqlalchemy import func
-from typing import Optional
+from db.models import Ride, RideParticipant, RideStatus, ParticipantStatus, User
+from sqlalchemy import func, and_, or_, true, literal_column
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from typing import List, Optional
 from websocket_manager import manager
+from services.pagination import DEFAULT_PAGE_SIZE, clamp_limit, after_cursor, split_page
+from services.cache import ResponseCache, TTLCache
+from services import geo
+from services.serializers import ride_payload, page_payload, serialize_rides
+from services.notification import notify, notification_dispatcher
+import math
+import os
+import re
+
+# ---------------------------------------------------------------
+# cache of rendered public listings (/rides, /upcoming-rides)
+# ---------------------------------------------------------------
+LISTING_CACHE_TTL = float(os.getenv("LISTING_CACHE_TTL", "30"))
+LISTING_CACHE_SIZE = int(os.getenv("LISTING_CACHE_SIZE", "1000"))
+
+listing_cache = ResponseCache(maxsize=LISTING_CACHE_SIZE, ttl=LISTING_CACHE_TTL)
+
+# ---------------------------------------------------------------
+# cache of rendered ride details, keyed (rideId, requester is host)
+# ---------------------------------------------------------------
+DETAIL_CACHE_TTL = float(os.getenv("DETAIL_CACHE_TTL", "30"))
+DETAIL_CACHE_SIZE = int(os.getenv("DETAIL_CACHE_SIZE", "5000"))
+
+detail_cache = ResponseCache(maxsize=DETAIL_CACHE_SIZE, ttl=DETAIL_CACHE_TTL)
+# rideId -> hostId, filled by get_ride_details; a ride's host never changes
+ride_hosts = TTLCache(maxsize=DETAIL_CACHE_SIZE, ttl=3600)
+
+
+def ride_detail_key(ride_id, requester_id):
+    """detail_cache key, or None until the ride's host has been seen."""
+    host_id = ride_hosts.get(str(ride_id))
+    if host_id is None:
+        return None
+    return str(ride_id), host_id == str(requester_id)
+
+
+def _on_rides_changed(data: dict):
+    listing_cache.invalidate()
+    ride_id = data.get("rideId")
+    if ride_id is None:
+        detail_cache.invalidate()
+    else:
+        detail_cache.discard((ride_id, True), (ride_id, False))
+
+manager.on_event("rides.changed", _on_rides_changed)
+
+
+async def rides_changed(ride_id=None):
+    """Call after committing any write that changes what listings show."""
+    # canonical form, as detail_cache/ride_hosts key it ("ABC..." == "abc...")
+    data = {"rideId": str(uuid.UUID(str(ride_id))) if ride_id is not None else None}
+    _on_rides_changed(data)
+    await manager.publish_event("rides.changed", data)
 
 #--------------------------
 # create a new ride event
 #--------------------------
-def create_ride(db: Session, host_id: str, ride_data: RideSchema):
+def _point(lat: Optional[float], lon: Optional[float], name: str):
+    """(lat, lon, geohash) for an optional coordinate pair."""
+    if lat is None and lon is None:
+        return None, None, None
+    if lat is None or lon is None:
+        raise ValueError(f"{name} needs both latitude and longitude")
+    return lat, lon, geo.encode(lat, lon)
+
+
+async def create_ride(db: AsyncSession, host_id: str, ride_data: RideSchema):
+    start_lat, start_lon, start_hash = _point(ride_data.startLat, ride_data.startLon, "start point")
+    end_lat, end_lon, end_hash = _point(ride_data.endLat, ride_data.endLon, "end point")
     new_ride = Ride(
         rideId=uuid.uuid4(),
         hostId=host_id,
@@ -21,6 +87,12 @@ def create_ride(db: Session, host_id: str, ride_data: RideSchema):
         rideStartTime=ride_data.rideStartTime,
         rideStartPoint=ride_data.rideStartPoint,
         rideEndPoint=ride_data.rideEndPoint,
+        startLat=start_lat,
+        startLon=start_lon,
+        startGeohash=start_hash,
+        endLat=end_lat,
+        endLon=end_lon,
+        endGeohash=end_hash,
         rideDuration=ride_data.rideDuration,
         haltDuration=ride_data.haltDuration,
         routeLink=ride_data.routeLink or "",
@@ -29,39 +101,167 @@ def create_ride(db: Session, host_id: str, ride_data: RideSchema):
         createdAt=datetime.utcnow()
     )
     db.add(new_ride)
-    db.commit()
-    db.refresh(new_ride)
+    await db.commit()
+    await rides_changed(new_ride.rideId)
+    await db.refresh(new_ride)
     return new_ride
 
+# ---------------------------------------------------------------
+# read-only projections
+# ---------------------------------------------------------------
+# Listings and details select just the columns they render, as plain row
+# tuples: no ORM instances, no identity map, and never passwordHash etc.
+RIDE_COLUMNS = (
+    Ride.rideId,
+    Ride.rideName,
+    Ride.rideStartTime,
+    Ride.rideStartPoint,
+    Ride.rideEndPoint,
+    Ride.rideDuration,
+    Ride.haltDuration,
+    Ride.routeLink,
+    Ride.maxParticipants,
+    Ride.approvedCount,
+    Ride.status,
+    Ride.startLat,
+    Ride.startLon,
+    Ride.endLat,
+    Ride.endLon,
+    Ride.hostId,
+    User.username.label("hostUsername"),
+)
+
+
+def _ride_rows():
+    return select(*RIDE_COLUMNS).join(User, User.userId == Ride.hostId)
+
+
+async def _participants_by_ride(db: AsyncSession, ride_ids):
+    """{rideId: [(userId, username, status), ...]} for the given rides."""
+    by_ride = {ride_id: [] for ride_id in ride_ids}
+    if not by_ride:
+        return by_ride
+    stmt = (
+        select(RideParticipant.rideId, RideParticipant.userId, User.username, RideParticipant.status)
+        .join(User, User.userId == RideParticipant.userId)
+        .where(RideParticipant.rideId.in_(by_ride))
+    )
+    for ride_id, user_id, username, status in await db.execute(stmt):
+        by_ride[ride_id].append((user_id, username, status))
+    return by_ride
+
+
 # -------------------------
-# get all rides
+# keyset paging on (rideStartTime, rideId)
 # -------------------------
-def get_all_rides(db: Session):
+def _ride_key(ride):
+    return ride.rideStartTime, ride.rideId
+
 
-    rides = db.query(Ride).options(
-        selectinload(Ride.host),
-        selectinload(Ride.participants).selectinload(RideParticipant.user),
-    ).all()
-    return rides
+async def _ride_page(db: AsyncSession, stmt, cursor: Optional[str], limit: int):
+    """One page of ride payloads plus the next cursor."""
+    limit = clamp_limit(limit)
+    after = after_cursor(Ride.rideStartTime, Ride.rideId, cursor)
+    if after is not None:
+        stmt = stmt.where(after)
+    stmt = stmt.order_by(Ride.rideStartTime, Ride.rideId).limit(limit + 1)
+    rows, next_cursor = split_page((await db.execute(stmt)).all(), limit, _ride_key)
+    participants = await _participants_by_ride(db, [row.rideId for row in rows])
+    return serialize_rides(rows, participants), next_cursor
+
+# -------------------------
+# get all rides
+# -------------------------
+async def get_all_rides(
+    db: AsyncSession,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    return await _ride_page(db, _ride_rows(), cursor, limit)
 
 # -------------------------
 # get upcoming rides
 # -------------------------
-def get_upcoming_rides(db: Session):
-    rides = db.query(Ride).filter(
-        Ride.status == RideStatus.UPCOMING
-    ).options(
-        selectinload(Ride.host),
-        selectinload(Ride.participants).selectinload(RideParticipant.user),
-    ).all()
-    return rides
+async def get_upcoming_rides(
+    db: AsyncSession,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    stmt = _ride_rows().where(Ride.status == RideStatus.UPCOMING)
+    return await _ride_page(db, stmt, cursor, limit)
+
+# -------------------------
+# upcoming rides near a point
+# -------------------------
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "200"))
+
+
+async def get_rides_near(
+    db: AsyncSession,
+    lat: float,
+    lon: float,
+    radius_km: float = 25,
+    starts_after: Optional[datetime] = None,
+    starts_before: Optional[datetime] = None,
+    by: str = "start",
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    """Upcoming rides whose start (or end) point is within radius_km, nearest first."""
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("invalid coordinates")
+    if not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        raise ValueError(f"radius_km must be between 0 and {NEARBY_MAX_RADIUS_KM:g}")
+    if by not in ("start", "end"):
+        raise ValueError("by must be 'start' or 'end'")
+    limit = clamp_limit(limit)
+
+    if by == "start":
+        geohash, point_lat, point_lon = Ride.startGeohash, Ride.startLat, Ride.startLon
+    else:
+        geohash, point_lat, point_lon = Ride.endGeohash, Ride.endLat, Ride.endLon
+
+    # the 3x3 covering cells are prefix ranges on the partial geohash index;
+    # the exact distance check trims the corners in the same query
+    cells = geo.covering_cells(lat, lon, radius_km)
+    distance = _distance_km(lat, lon, point_lat, point_lon).label("distanceKm")
+    stmt = (
+        _ride_rows()
+        .add_columns(distance)
+        .where(
+            Ride.status == RideStatus.UPCOMING,
+            or_(*(geohash.like(cell + "%") for cell in sorted(cells))),
+            Ride.rideStartTime >= (starts_after or datetime.now(timezone.utc)),
+            distance <= radius_km,
+        )
+        .order_by(distance, Ride.rideStartTime, Ride.rideId)
+        .limit(limit)
+    )
+    if starts_before is not None:
+        stmt = stmt.where(Ride.rideStartTime <= starts_before)
+
+    rows = (await db.execute(stmt)).all()
+    participants = await _participants_by_ride(db, [row.rideId for row in rows])
+    items = serialize_rides(rows, participants)
+    for item, row in zip(items, rows):
+        item["distanceKm"] = round(row.distanceKm, 3)
+    return {"items": items}
+
+
+def _distance_km(lat: float, lon: float, point_lat, point_lon):
+    """geo.haversine_km from (lat, lon) to the given columns, as SQL."""
+    p1, p2 = math.radians(lat), func.radians(point_lat)
+    a = (
+        func.power(func.sin((p2 - p1) / 2), 2)
+        + math.cos(p1) * func.cos(p2) * func.power(func.sin(func.radians(point_lon - lon) / 2), 2)
+    )
+    return 2 * geo.EARTH_RADIUS_KM * func.asin(func.least(1.0, func.sqrt(a)))
 
 # ----------------------------
 # join ride(request the host)
 # ----------------------------
-async def request_ride_participation( db: Session,user_id: str, ride_id: str):
+async def request_ride_participation( db: AsyncSession,user_id: str, ride_id: str):
     stmt = select(Ride).where(Ride.rideId == ride_id)
-    ride = db.execute(stmt).scalar_one_or_none()
+    ride = (await db.execute(stmt)).scalar_one_or_none()
     if not ride:
         raise ValueError("ride not found")
     if ride.status != RideStatus.UPCOMING:
@@ -72,7 +272,7 @@ async def request_ride_participation( db: Session,user_id: str, ride_id: str):
         RideParticipant.rideId == ride_id,
         RideParticipant.userId == user_id
     )
-    existing = db.execute(stmt).scalar_one_or_none()
+    existing = (await db.execute(stmt)).scalar_one_or_none()
     if existing:
         raise ValueError("user has either already requested or joined this ride")
 
@@ -83,41 +283,52 @@ async def request_ride_participation( db: Session,user_id: str, ride_id: str):
         requestedAt=datetime.now(timezone.utc)
     )
     db.add(participation)
-    db.commit()
-    db.refresh(participation)
-
-    from websocket_manager import manager
-
-    await manager.send_to_user(
-        ride.hostId,
-        {
-            "type": "NEW_JOIN_REQUEST",
-            "rideId": ride.rideId,
-            "fromUser": user_id
-        }
-    )
+    await notify(db, [ride.hostId], {
+        "type": "NEW_JOIN_REQUEST",
+        "rideId": ride.rideId,
+        "fromUser": user_id
+    })
+    await db.commit()
+    notification_dispatcher.wake()
+    await rides_changed(ride_id)
+    await db.refresh(participation)
 
     return participation
 
 
+# ----------------------------------------------------------
+# approved counter (same transaction as the status change)
+# ----------------------------------------------------------
+async def _adjust_approved_count(db: AsyncSession, ride_id, delta: int):
+    await db.execute(
+        update(Ride)
+        .where(Ride.rideId == ride_id)
+        .values(approvedCount=Ride.approvedCount + delta)
+    )
+
+
+async def _check_decision_allowed(db: AsyncSession, host_id, ride_id):
+    stmt = select(Ride.hostId, Ride.status).where(Ride.rideId == ride_id)
+    ride = (await db.execute(stmt)).first()
+    if not ride:
+        raise ValueError("Ride not found")
+    if ride.hostId != host_id:
+        raise ValueError("Only host can approve or reject participants")
+    if ride.status != RideStatus.UPCOMING:
+        raise ValueError("Cannot modify participants for this ride")
+
+
 # -------------------------------
 # approve ride(done by the host)
 # -------------------------------
 async def decide_participation(
-    db: Session,
+    db: AsyncSession,
     host_id: str,
     ride_id: str,
     participant_user_id: str,
     approve: bool
 ):
-    stmt = select(Ride).where(Ride.rideId == ride_id)
-    ride = db.execute(stmt).scalar_one_or_none()
-    if not ride:
-        raise ValueError("Ride not found")
-    if ride.hostId != host_id:
-        raise ValueError("Only host can approve or reject participants")
-    if ride.status != RideStatus.UPCOMING:
-        raise ValueError("Cannot modify participants for this ride")
+    await _check_decision_allowed(db, host_id, ride_id)
     if participant_user_id == host_id:
         raise ValueError("Host cannot be a participant")
 
@@ -125,122 +336,190 @@ async def decide_participation(
         RideParticipant.rideId == ride_id,
         RideParticipant.userId == participant_user_id
     )
-    participant = db.execute(stmt).scalar_one_or_none()
+    participant = (await db.execute(stmt)).scalar_one_or_none()
 
     if not participant:
         raise ValueError("Participant request not found")
     if participant.status != ParticipantStatus.PENDING:
         raise ValueError("Participant already decided")
 
-    if approve:
-        stmt = select(func.count()).where(
+    # The checks above are advisory; the two conditional UPDATEs below are
+    # what hold under concurrency. Claiming the PENDING row first means
+    # only one decision per participant wins, and the capacity predicate
+    # is evaluated by Postgres against the locked ride row.
+    result = await db.execute(
+        update(RideParticipant)
+        .where(
             RideParticipant.rideId == ride_id,
-            RideParticipant.status == ParticipantStatus.APPROVED
+            RideParticipant.userId == participant_user_id,
+            RideParticipant.status == ParticipantStatus.PENDING,
         )
-        approved_count = db.execute(stmt).scalar_one()
-        if approved_count >= ride.maxParticipants:
+        .values(
+            status=ParticipantStatus.APPROVED if approve else ParticipantStatus.REJECTED,
+            decisionAt=datetime.now(timezone.utc),
+        )
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise ValueError("Participant already decided")
+
+    if approve:
+        result = await db.execute(
+            update(Ride)
+            .where(
+                Ride.rideId == ride_id,
+                Ride.status == RideStatus.UPCOMING,
+                Ride.approvedCount < Ride.maxParticipants,
+            )
+            .values(approvedCount=Ride.approvedCount + 1)
+        )
+        if result.rowcount == 0:
+            await db.rollback()
             raise ValueError("Maximum participants limit reached")
 
-        participant.status = ParticipantStatus.APPROVED
-    else:
-        participant.status = ParticipantStatus.REJECTED
+    await notify(db, [participant_user_id], {
+        "type": "PARTICIPATION_DECISION",
+        "rideId": ride_id,
+        "approved": approve
+    })
+    await db.commit()
+    notification_dispatcher.wake()
+    await rides_changed(ride_id)
+    await db.refresh(participant)
 
-    participant.decisionAt = datetime.now(timezone.utc)
+    return participant
 
-    db.commit()
-    db.refresh(participant)
 
-    await manager.send_to_user(
-    participant_user_id,
-    {
+
+# ------------------------------------------------
+# approve/reject many requests at once (host)
+# ------------------------------------------------
+async def decide_participations(
+    db: AsyncSession,
+    host_id: str,
+    ride_id: str,
+    participant_user_ids: List[uuid.UUID],
+    approve: bool,
+):
+    """Decide a batch of pending requests in one transaction.
+
+    All-or-nothing on capacity: if approving every still-pending user would
+    overfill the ride, nothing is changed. Users that are not pending are
+    returned as skipped.
+    """
+    await _check_decision_allowed(db, host_id, ride_id)
+    user_ids = list(dict.fromkeys(participant_user_ids))
+    if not user_ids:
+        raise ValueError("No participants given")
+
+    # claim every still-PENDING row in one statement; rows decided by a
+    # concurrent request are simply not returned
+    result = await db.execute(
+        update(RideParticipant)
+        .where(
+            RideParticipant.rideId == ride_id,
+            RideParticipant.userId.in_(user_ids),
+            RideParticipant.status == ParticipantStatus.PENDING,
+        )
+        .values(
+            status=ParticipantStatus.APPROVED if approve else ParticipantStatus.REJECTED,
+            decisionAt=datetime.now(timezone.utc),
+        )
+        .returning(RideParticipant.userId)
+    )
+    decided = result.scalars().all()
+
+    if approve and decided:
+        # single capacity check for the whole batch
+        result = await db.execute(
+            update(Ride)
+            .where(
+                Ride.rideId == ride_id,
+                Ride.status == RideStatus.UPCOMING,
+                Ride.approvedCount + len(decided) <= Ride.maxParticipants,
+            )
+            .values(approvedCount=Ride.approvedCount + len(decided))
+        )
+        if result.rowcount == 0:
+            await db.rollback()
+            raise ValueError("Maximum participants limit reached")
+
+    await notify(db, decided, {
         "type": "PARTICIPATION_DECISION",
         "rideId": ride_id,
-        "approved": approve
-    }
-    )
+        "approved": approve,
+    })
+    await db.commit()
 
-    return participant
+    if decided:
+        notification_dispatcher.wake()
+        await rides_changed(ride_id)
+
+    decided_set = set(decided)
+    return {
+        "decided": decided,
+        "skipped": [u for u in user_ids if u not in decided_set],
+    }
 
 
 
 # -------------------------------------------------------------------------
 # get all details about the ride including all the participants
 # -------------------------------------------------------------------------
-def get_ride_details(
-    db: Session,
+async def get_ride_details(
+    db: AsyncSession,
     ride_id: str,
     requester_id: str
 ):
-    # Fetch ride with host and participants
-    stmt = (
-        select(Ride)
-        .where(Ride.rideId == ride_id)
-        .options(
-            selectinload(Ride.host),
-            selectinload(Ride.participants).selectinload(RideParticipant.user),
-        )
+    # one statement: ride columns plus the participant groups built by
+    # Postgres; pending/rejected are filtered out there for non-hosts
+    member = aliased(User)
+    entry = func.json_build_object(
+        "userId", RideParticipant.userId,
+        "username", member.username,
+        "status", RideParticipant.status,
     )
+    is_host = Ride.hostId == requester_id
+
+    def group(status, visible):
+        agg = func.json_agg(aggregate_order_by(entry, RideParticipant.requestedAt))
+        return func.coalesce(
+            agg.filter(and_(RideParticipant.status == status, visible)),
+            literal_column("'[]'::json"),
+        )
 
-    ride = db.execute(stmt).scalar_one_or_none()
+    groups = (
+        select(func.json_build_object(
+            "approved", group(ParticipantStatus.APPROVED, true()),
+            "pending", group(ParticipantStatus.PENDING, is_host),
+            "rejected", group(ParticipantStatus.REJECTED, is_host),
+        ))
+        .select_from(RideParticipant)
+        .join(member, member.userId == RideParticipant.userId)
+        .where(RideParticipant.rideId == Ride.rideId)
+        .correlate(Ride)
+        .scalar_subquery()
+    )
+    stmt = _ride_rows().add_columns(groups.label("participants")).where(Ride.rideId == ride_id)
+    ride = (await db.execute(stmt)).first()
 
     if not ride:
         raise ValueError("Ride not found")
 
-    is_host = str(ride.hostId) == str(requester_id)
-
-    approved = []
-    pending = []
-    rejected = []
-
-    for p in ride.participants:
-        user_data = {
-            "userId": p.user.userId,
-            "username": p.user.username,
-            "status": p.status.value,
-        }
-
-        if p.status == ParticipantStatus.APPROVED:
-            approved.append(user_data)
-
-        elif is_host:
-            if p.status == ParticipantStatus.PENDING:
-                pending.append(user_data)
-            elif p.status == ParticipantStatus.REJECTED:
-                rejected.append(user_data)
-
-    return {
-        "rideId": ride.rideId,
-        "rideName": ride.rideName,
-        "rideStartTime": ride.rideStartTime,
-        "rideStartPoint": ride.rideStartPoint,
-        "rideEndPoint": ride.rideEndPoint,
-        "rideDuration": ride.rideDuration,
-        "haltDuration": ride.haltDuration,
-        "routeLink": ride.routeLink,
-        "maxParticipants": ride.maxParticipants,
-        "status": ride.status.value,
-        "host": {
-            "userId": ride.host.userId,
-            "username": ride.host.username,
-        },
-        "participants": {
-            "approved": approved,
-            "pending": pending if is_host else [],
-            "rejected": rejected if is_host else [],
-        },
-    }
+    ride_hosts.set(str(ride.rideId), str(ride.hostId))
+    return ride_payload(ride, ride.hostUsername, ride.participants)
 
 
 
 # ------------------------------------------------
 # leave ride(for participants)
 # ------------------------------------------------
-def leave_ride(
-    db: Session,
+async def leave_ride(
+    db: AsyncSession,
     ride_id: str,
     requester_id: str
 ):
-    ride = db.query(Ride).filter(Ride.rideId == ride_id).first()
+    ride = (await db.execute(select(Ride).where(Ride.rideId == ride_id))).scalar_one_or_none()
 
     if not ride:
         raise ValueError("Ride not found")
@@ -249,20 +528,26 @@ def leave_ride(
     if ride.hostId == requester_id:
         raise PermissionError("Host cannot leave the ride. Cancel it instead.")
 
-    participation = (
-        db.query(RideParticipant)
-        .filter(
+    # delete and read the old status in one statement, so a concurrent
+    # approval cannot slip between the read and the counter update
+    stmt = (
+        delete(RideParticipant)
+        .where(
             RideParticipant.rideId == ride_id,
             RideParticipant.userId == requester_id
         )
-        .first()
+        .returning(RideParticipant.status)
     )
+    left_status = (await db.execute(stmt)).scalar_one_or_none()
 
-    if not participation:
+    if left_status is None:
         raise ValueError("You are not part of this ride")
 
-    db.delete(participation)
-    db.commit()
+    if left_status == ParticipantStatus.APPROVED:
+        await _adjust_approved_count(db, ride_id, -1)
+
+    await db.commit()
+    await rides_changed(ride_id)
 
     return {"message": "Successfully left the ride"}
 
@@ -270,46 +555,98 @@ def leave_ride(
 # ------------------------------------------------
 # cancel ride(only for the ride host)
 # ------------------------------------------------
-def cancel_ride(
-    db: Session,
+async def cancel_ride(
+    db: AsyncSession,
     ride_id: str,
     requester_id: str
 ):
-    ride = db.query(Ride).filter(Ride.rideId == ride_id).first()
+    host_id = (await db.execute(select(Ride.hostId).where(Ride.rideId == ride_id))).scalar_one_or_none()
 
-    if not ride:
+    if not host_id:
         raise ValueError("Ride not found")
 
-    if ride.hostId != requester_id:
+    if host_id != requester_id:
         raise PermissionError("Only host can cancel the ride")
 
-    ride.status = RideStatus.CANCELLED
+    # participants before the ride, the order decisions and leave_ride
+    # lock them in, so a cancel racing one of those can't deadlock
+    await db.execute(
+        update(RideParticipant)
+        .where(RideParticipant.rideId == ride_id)
+        .values(status=ParticipantStatus.REJECTED)
+    )
 
-    # Optional: mark all participants cancelled
-    for p in ride.participants:
-        p.status = ParticipantStatus.REJECTED
+    # guarded like the approval path: a ride the scheduler has just
+    # completed (or another request cancelled) is left alone
+    result = await db.execute(
+        update(Ride)
+        .where(
+            Ride.rideId == ride_id,
+            Ride.status.in_([RideStatus.UPCOMING, RideStatus.ONGOING]),
+        )
+        .values(status=RideStatus.CANCELLED, approvedCount=0)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
+        raise ValueError("Only upcoming or ongoing rides can be cancelled")
 
-    db.commit()
+    await db.commit()
+    await rides_changed(ride_id)
 
     return {"message": "Ride cancelled successfully"}
 
 
+# ---------------------------------------------------
+# text search over ride name / start / end
+# ---------------------------------------------------
+SEARCH_MIN_TRIGRAM = 3  # shorter terms can't use the trigram index
+_SEARCH_WORD = re.compile(r"\w+")
+
+
+def _search_filters(q: str):
+    """(full-text filter, trigram fallback filter or None) for a query."""
+    words = _SEARCH_WORD.findall(q.lower())
+    if not words:
+        raise ValueError("search query has no words")
+    # every word, each as a prefix: "nandi hil" -> 'nandi:* & hil:*'
+    tsquery = func.to_tsquery("simple", " & ".join(f"{w}:*" for w in words))
+    term = " ".join(words)
+    fallback = None
+    if len(term) >= SEARCH_MIN_TRIGRAM:
+        # partial matches inside words, e.g. "galore"
+        fallback = Ride.searchText.contains(term, autoescape=True)
+    return Ride.searchVector.op("@@")(tsquery), fallback
+
+
 # ---------------------------------------------------
 # get rides based on specified filters
 # ---------------------------------------------------
-def list_rides(
-    db: Session,
+async def list_rides(
+    db: AsyncSession,
     requester_id: str,
     status: Optional[RideStatus] = None,
     hosted_by_me: bool = False,
     participating: bool = False,
     available: bool = False,
-    skip: int = 0,
-    limit: int = 20,
+    q: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
 ):
-    stmt = select(Ride).options(
-        selectinload(Ride.host),
-        selectinload(Ride.participants)
+    limit = clamp_limit(limit)
+
+    stmt = (
+        select(
+            Ride.rideId,
+            Ride.rideName,
+            Ride.rideStartTime,
+            Ride.rideStartPoint,
+            Ride.rideEndPoint,
+            Ride.status,
+            User.username.label("host"),
+            Ride.approvedCount,
+            Ride.maxParticipants,
+        )
+        .join(User, User.userId == Ride.hostId)
     )
 
     # Filter by status
@@ -322,43 +659,75 @@ def list_rides(
 
     # Participating rides
     if participating:
-        stmt = stmt.join(RideParticipant).where(
-            RideParticipant.userId == requester_id,
-            RideParticipant.status == ParticipantStatus.APPROVED
+        stmt = stmt.where(
+            select(RideParticipant.rideId)
+            .where(
+                RideParticipant.rideId == Ride.rideId,
+                RideParticipant.userId == requester_id,
+                RideParticipant.status == ParticipantStatus.APPROVED,
+            )
+            .exists()
         )
 
-    rides = db.execute(stmt).scalars().unique().all()
+    # Available: upcoming and not yet full
+    if available:
+        stmt = stmt.where(
+            Ride.status == RideStatus.UPCOMING,
+            Ride.approvedCount < Ride.maxParticipants,
+        )
 
-    results = []
+    after = after_cursor(Ride.rideStartTime, Ride.rideId, cursor)
+    if after is not None:
+        stmt = stmt.where(after)
 
-    for ride in rides:
+    stmt = stmt.order_by(Ride.rideStartTime, Ride.rideId).limit(limit + 1)
 
-        # Available filter (after fetch for capacity logic clarity)
-        if available:
-            if ride.status != RideStatus.UPCOMING:
-                continue
+    async def fetch(stmt):
+        rows = (await db.execute(stmt)).mappings().all()
+        return split_page(rows, limit, lambda row: (row["rideStartTime"], row["rideId"]))
 
-            approved_count = sum(
-                1 for p in ride.participants
-                if p.status == ParticipantStatus.APPROVED
-            )
+    # Text search on name / start / end. The two filters are run separately
+    # rather than OR-ed: Postgres estimates each well on its own and picks
+    # the GIN index for rare terms, but not for the combination.
+    if q:
+        full_text, fallback = _search_filters(q)
+        rows, next_cursor = await fetch(stmt.where(full_text))
+        if not rows and fallback is not None:
+            rows, next_cursor = await fetch(stmt.where(fallback))
+    else:
+        rows, next_cursor = await fetch(stmt)
 
-            if approved_count >= ride.maxParticipants:
-                continue
-
-        results.append({
-            "rideId": ride.rideId,
-            "rideName": ride.rideName,
-            "rideStartTime": ride.rideStartTime,
-            "rideStartPoint": ride.rideStartPoint,
-            "rideEndPoint": ride.rideEndPoint,
-            "status": ride.status.value,
-            "host": ride.host.username,
-            "approvedCount": sum(
-                1 for p in ride.participants
-                if p.status == ParticipantStatus.APPROVED
-            ),
-            "maxParticipants": ride.maxParticipants,
-        })
-
-    return results[skip: skip + limit]
+    return page_payload([dict(row) for row in rows], next_cursor)
+
+
+# ---------------------------------------------------
+# approvedCount consistency check / repair
+# ---------------------------------------------------
+def _approved_count_drift():
+    actual = (
+        select(func.count())
+        .where(
+            RideParticipant.rideId == Ride.rideId,
+            RideParticipant.status == ParticipantStatus.APPROVED,
+        )
+        .correlate(Ride)
+        .scalar_subquery()
+    )
+    return actual, Ride.approvedCount != actual
+
+
+async def check_approved_counts(db: AsyncSession):
+    """Rides whose stored approvedCount differs from the participant rows."""
+    actual, drifted = _approved_count_drift()
+    stmt = select(Ride.rideId, Ride.approvedCount, actual.label("actual")).where(drifted)
+    return (await db.execute(stmt)).mappings().all()
+
+
+async def repair_approved_counts(db: AsyncSession) -> int:
+    actual, drifted = _approved_count_drift()
+    result = await db.execute(
+        update(Ride).where(drifted).values(approvedCount=actual)
+    )
+    await db.commit()
+    await rides_changed()
+    return result.rowcount
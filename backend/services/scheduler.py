@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+import psycopg
+from sqlalchemy import exists, func, select, update
+
+from db.database import get_async_session_local, get_libpq_dsn
+from db.models import Ride, RideParticipant, RideStatus, RideTrackChunk, ParticipantStatus
+from services.notification import notify, notification_dispatcher
+from services.ride import rides_changed
+from services.track import backfill_ride_durations
+
+logger = logging.getLogger(__name__)
+
+# -------------------------
+# Ride status scheduler (env)
+# -------------------------
+# Moves rides UPCOMING -> ONGOING at rideStartTime and ONGOING -> COMPLETED
+# at rideStartTime + rideDuration hours. Every worker runs the loop but only
+# the one holding the Postgres advisory lock does the updates; if it dies
+# its connection closes, the lock is released and another worker takes over
+# on its next tick.
+RIDE_SCHEDULER_INTERVAL = float(os.getenv("RIDE_SCHEDULER_INTERVAL", "30"))
+# end time for rides created without a duration
+RIDE_DEFAULT_DURATION_HOURS = float(os.getenv("RIDE_DEFAULT_DURATION_HOURS", "4"))
+# rides moved per UPDATE; a backlog is worked off in several statements
+RIDE_SCHEDULER_BATCH = int(os.getenv("RIDE_SCHEDULER_BATCH", "500"))
+# rides moved later than this (e.g. a backlog after downtime) change status
+# silently instead of notifying riders about a ride long past
+RIDE_STATUS_NOTIFY_MAX_LAG = float(os.getenv("RIDE_STATUS_NOTIFY_MAX_LAG", "3600"))
+# any constant shared by all workers; "ride" in ascii
+RIDE_SCHEDULER_LOCK_KEY = int(os.getenv("RIDE_SCHEDULER_LOCK_KEY", "1919510629"))
+
+
+def _ride_end():
+    duration = func.coalesce(Ride.rideDuration, RIDE_DEFAULT_DURATION_HOURS)
+    return Ride.rideStartTime + func.make_interval(0, 0, 0, 0, 0, 0, duration * 3600)
+
+
+def _approved_ids():
+    return (
+        select(func.array_agg(RideParticipant.userId))
+        .where(
+            RideParticipant.rideId == Ride.rideId,
+            RideParticipant.status == ParticipantStatus.APPROVED,
+        )
+        .scalar_subquery()
+        .label("approvedIds")
+    )
+
+
+async def _transition(db, current: RideStatus, new: RideStatus, due, now: datetime) -> list:
+    """Move one batch of due rides to `new`; returns the rows it changed."""
+    batch = (
+        select(Ride.rideId)
+        .where(Ride.status == current, Ride.rideStartTime <= now, due <= now)
+        .order_by(Ride.rideStartTime)
+        .limit(RIDE_SCHEDULER_BATCH)
+        # rows a user is cancelling right now are picked up next tick
+        .with_for_update(skip_locked=True)
+    )
+    stmt = (
+        update(Ride)
+        .where(Ride.rideId.in_(batch), Ride.status == current)
+        .values(status=new)
+        .returning(
+            Ride.rideId,
+            Ride.rideName,
+            Ride.hostId,
+            due.label("due"),
+            _ride_end().label("ends"),
+            _approved_ids(),
+            exists().where(RideTrackChunk.rideId == Ride.rideId).label("tracked"),
+        )
+    )
+    rows = (await db.execute(stmt)).all()
+
+    for row in rows:
+        if (now - row.due).total_seconds() > RIDE_STATUS_NOTIFY_MAX_LAG:
+            continue
+        # overdue on both counts: it completes this same run, only say that
+        if new == RideStatus.ONGOING and row.ends <= now:
+            continue
+        await notify(db, [row.hostId, *(row.approvedIds or ())], {
+            "type": "RIDE_STATUS",
+            "rideId": row.rideId,
+            "rideName": row.rideName,
+            "status": new.value,
+        })
+    await db.commit()
+    return rows
+
+
+class RideScheduler:
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._lock_conn: Optional[psycopg.AsyncConnection] = None
+        self.started = 0
+        self.completed = 0
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_seconds = 0.0
+        # how late the most overdue ride of the last run was moved
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    @property
+    def leader(self) -> bool:
+        return self._lock_conn is not None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release()
+
+    def stats(self) -> dict:
+        return {
+            "leader": self.leader,
+            "runs": self.runs,
+            "started": self.started,
+            "completed": self.completed,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_seconds": round(self.last_run_seconds, 3),
+            "last_lag_seconds": round(self.last_lag_seconds, 3),
+            "max_lag_seconds": round(self.max_lag_seconds, 3),
+        }
+
+    # -------------------------
+    # leader election
+    # -------------------------
+    async def _acquire(self) -> bool:
+        """True while this worker holds the scheduler lock."""
+        if self._lock_conn is not None:
+            try:
+                # a dead connection means the lock is gone too
+                await self._lock_conn.execute("SELECT 1")
+                return True
+            except psycopg.Error:
+                logger.warning("ride scheduler lost its lock connection")
+                await self._release()
+
+        conn = await psycopg.AsyncConnection.connect(get_libpq_dsn(), autocommit=True)
+        cur = await conn.execute("SELECT pg_try_advisory_lock(%s)", (RIDE_SCHEDULER_LOCK_KEY,))
+        if (await cur.fetchone())[0]:
+            self._lock_conn = conn
+            logger.info("ride scheduler: this worker is the leader")
+            return True
+        await conn.close()
+        return False
+
+    async def _release(self):
+        conn, self._lock_conn = self._lock_conn, None
+        if conn is not None:
+            try:
+                await conn.close()
+            except psycopg.Error:
+                pass
+
+    # -------------------------
+    # transitions
+    # -------------------------
+    async def _loop(self):
+        while True:
+            try:
+                if await self._acquire():
+                    await self.run()
+            except Exception:
+                logger.exception("ride scheduler run failed")
+            await asyncio.sleep(RIDE_SCHEDULER_INTERVAL)
+
+    async def run(self):
+        """Move every ride that is due; normally called by the leader's loop."""
+        began = time.monotonic()
+        now = datetime.now(timezone.utc)
+        started: List = []
+        completed: List = []
+
+        SessionLocal = get_async_session_local()
+        async with SessionLocal() as db:
+            # started first, so a ride overdue on both counts ends this run COMPLETED
+            for current, new, due, moved in (
+                (RideStatus.UPCOMING, RideStatus.ONGOING, Ride.rideStartTime, started),
+                (RideStatus.ONGOING, RideStatus.COMPLETED, _ride_end(), completed),
+            ):
+                while True:
+                    rows = await _transition(db, current, new, due, now)
+                    moved.extend(rows)
+                    if len(rows) < RIDE_SCHEDULER_BATCH:
+                        break
+
+        if started or completed:
+            notification_dispatcher.wake()
+            await rides_changed()
+
+        for row in completed:
+            if not row.tracked:
+                continue
+            try:
+                async with SessionLocal() as db:
+                    await backfill_ride_durations(db, row.rideId)
+            except Exception:
+                logger.exception("backfilling durations of ride %s failed", row.rideId)
+
+        lag = max(((now - row.due).total_seconds() for row in started + completed), default=0.0)
+        self.started += len(started)
+        self.completed += len(completed)
+        self.runs += 1
+        self.last_run_at = now
+        self.last_run_seconds = time.monotonic() - began
+        self.last_lag_seconds = lag
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+
+
+ride_scheduler = RideScheduler()
@@ -0,0 +1,76 @@
+from typing import Iterable, Optional, Tuple
+
+import orjson
+from fastapi import Response
+
+from db.models import ParticipantStatus
+
+# Ride payloads are plain dicts holding the raw UUID / datetime / enum
+# values; orjson encodes those natively, so a response is built in one
+# pass instead of dict -> pydantic validation -> jsonable_encoder -> json.
+
+_GROUPS = {
+    ParticipantStatus.APPROVED: "approved",
+    ParticipantStatus.PENDING: "pending",
+    ParticipantStatus.REJECTED: "rejected",
+}
+
+# (userId, username, status)
+ParticipantRow = Tuple[object, str, ParticipantStatus]
+
+
+def participant_groups(participants: Iterable[ParticipantRow]) -> dict:
+    """Group participants into approved / pending / rejected lists."""
+    groups = {"approved": [], "pending": [], "rejected": []}
+    for user_id, username, status in participants:
+        groups[_GROUPS[status]].append(
+            {"userId": user_id, "username": username, "status": status}
+        )
+    return groups
+
+
+def ride_payload(ride, host_username: str, participants: dict) -> dict:
+    """RideResponse-shaped dict from anything with the Ride column attributes."""
+    return {
+        "rideId": ride.rideId,
+        "rideName": ride.rideName,
+        "rideStartTime": ride.rideStartTime,
+        "rideStartPoint": ride.rideStartPoint,
+        "rideEndPoint": ride.rideEndPoint,
+        "rideDuration": ride.rideDuration,
+        "haltDuration": ride.haltDuration,
+        "routeLink": ride.routeLink,
+        "maxParticipants": ride.maxParticipants,
+        "approvedCount": ride.approvedCount,
+        "status": ride.status,
+        "startLat": ride.startLat,
+        "startLon": ride.startLon,
+        "endLat": ride.endLat,
+        "endLon": ride.endLon,
+        "host": {
+            "userId": ride.hostId,
+            "username": host_username,
+        },
+        "participants": participants,
+    }
+
+
+def serialize_rides(rides, participants: dict) -> list:
+    """Ride rows (with hostUsername) plus {rideId: [ParticipantRow]} to payload dicts."""
+    return [
+        ride_payload(ride, ride.hostUsername, participant_groups(participants[ride.rideId]))
+        for ride in rides
+    ]
+
+
+def page_payload(items: list, next_cursor: Optional[str]) -> dict:
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def render(data) -> bytes:
+    return orjson.dumps(data)
+
+
+def json_response(data) -> Response:
+    """Payload rendered by orjson, without response-model re-validation."""
+    return Response(content=render(data), media_type="application/json")
@@ -0,0 +1,209 @@
+import os
+import struct
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Ride, RideParticipant, RideTrackChunk, ParticipantStatus
+from services.geo import EARTH_RADIUS_KM
+
+# -------------------------
+# Track analysis (env)
+# -------------------------
+# halted = covering less than this speed over the next TRACK_HALT_WINDOW
+# seconds; a window rather than point-to-point speed, because 5m of GPS
+# jitter between two 1 Hz fixes already reads as 18 km/h
+TRACK_HALT_SPEED_KMH = float(os.getenv("TRACK_HALT_SPEED_KMH", "3"))
+TRACK_HALT_WINDOW = float(os.getenv("TRACK_HALT_WINDOW", "30"))
+# fixes buffered by services/location.py are written at least this often
+TRACK_FLUSH_INTERVAL = float(os.getenv("TRACK_FLUSH_INTERVAL", "30"))
+
+# -------------------------
+# Chunk encoding
+# -------------------------
+# One chunk = one rider's fixes in time order. Coordinates are stored as
+# integer microdegrees and time as epoch ms; everything after the first
+# point is a delta, so a 1 Hz track is mostly small numbers that zlib
+# squeezes to a few bytes per point.
+#
+#   header: version u8, count u32, lat0 i32, lon0 i32, ts0 i64
+#   body:   zlib(int32 deltas of lat, lon, ts)
+_VERSION = 1
+_HEADER = struct.Struct("<BIiiq")
+
+Track = Tuple[np.ndarray, np.ndarray, np.ndarray]  # ts (ms), lat, lon
+
+
+def encode_chunk(ts_ms: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> bytes:
+    ts = np.asarray(ts_ms, dtype=np.int64)
+    lat_u = np.rint(np.asarray(lat) * 1e6).astype(np.int64)
+    lon_u = np.rint(np.asarray(lon) * 1e6).astype(np.int64)
+    header = _HEADER.pack(_VERSION, len(ts), int(lat_u[0]), int(lon_u[0]), int(ts[0]))
+    deltas = np.concatenate([np.diff(lat_u), np.diff(lon_u), np.diff(ts)]).astype("<i4")
+    return header + zlib.compress(deltas.tobytes())
+
+
+def decode_chunk(data: bytes) -> Track:
+    version, n, lat0, lon0, ts0 = _HEADER.unpack_from(data)
+    if version != _VERSION:
+        raise ValueError(f"unknown track chunk version {version}")
+    deltas = np.frombuffer(zlib.decompress(data[_HEADER.size:]), dtype="<i4").astype(np.int64)
+    d_lat, d_lon, d_ts = deltas.reshape(3, n - 1)
+
+    def restore(first, diffs):
+        return np.concatenate([[first], first + np.cumsum(diffs)])
+
+    return (
+        restore(ts0, d_ts),
+        restore(lat0, d_lat) / 1e6,
+        restore(lon0, d_lon) / 1e6,
+    )
+
+
+# -------------------------
+# Storage
+# -------------------------
+async def save_fixes(db: AsyncSession, ride_id, fixes: Iterable) -> int:
+    """Write fixes (user_id, lat, lon, ts) as one chunk per rider, in one INSERT."""
+    by_user: Dict[str, list] = {}
+    for fix in fixes:
+        by_user.setdefault(fix.user_id, []).append(fix)
+
+    rows = []
+    for user_id, points in by_user.items():
+        points.sort(key=lambda f: f.ts)
+        ts = np.fromiter((f.ts for f in points), dtype=np.int64, count=len(points))
+        lat = np.fromiter((f.lat for f in points), dtype=np.float64, count=len(points))
+        lon = np.fromiter((f.lon for f in points), dtype=np.float64, count=len(points))
+        rows.append({
+            "rideId": uuid.UUID(str(ride_id)),
+            "userId": uuid.UUID(str(user_id)),
+            "startTime": _from_ms(ts[0]),
+            "endTime": _from_ms(ts[-1]),
+            "pointCount": len(points),
+            "data": encode_chunk(ts, lat, lon),
+        })
+    if rows:
+        await db.execute(insert(RideTrackChunk), rows)
+        await db.commit()
+    return len(rows)
+
+
+async def load_tracks(db: AsyncSession, ride_id, user_id=None) -> Dict[str, Track]:
+    """{userId: (ts, lat, lon)} for a ride, each rider's chunks joined in order."""
+    stmt = (
+        select(RideTrackChunk.userId, RideTrackChunk.data)
+        .where(RideTrackChunk.rideId == ride_id)
+        .order_by(RideTrackChunk.userId, RideTrackChunk.startTime)
+    )
+    if user_id is not None:
+        stmt = stmt.where(RideTrackChunk.userId == user_id)
+
+    parts: Dict[str, list] = {}
+    for uid, data in await db.execute(stmt):
+        parts.setdefault(str(uid), []).append(decode_chunk(data))
+
+    tracks = {}
+    for uid, chunks in parts.items():
+        ts, lat, lon = (np.concatenate(column) for column in zip(*chunks))
+        # chunks from different workers may interleave
+        order = np.argsort(ts, kind="stable")
+        tracks[uid] = ts[order], lat[order], lon[order]
+    return tracks
+
+
+def _from_ms(ts_ms) -> datetime:
+    return datetime.fromtimestamp(int(ts_ms) / 1000, tz=timezone.utc)
+
+
+# -------------------------
+# Stats (vectorised)
+# -------------------------
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    dp = p2 - p1
+    dl = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(dp / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def track_stats(ts_ms: np.ndarray, lat: np.ndarray, lon: np.ndarray) -> dict:
+    """Distance, moving/halt time (hours) and average moving speed of a track."""
+    if len(ts_ms) < 2:
+        return {"points": int(len(ts_ms)), "distanceKm": 0.0, "durationHours": 0.0,
+                "movingHours": 0.0, "haltHours": 0.0, "avgSpeedKmh": 0.0}
+
+    dist = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    hours = np.diff(ts_ms) / 3_600_000
+
+    # for each segment start i, the first fix at least one window later
+    start = np.arange(len(ts_ms) - 1)
+    end = np.searchsorted(ts_ms, ts_ms[:-1] + TRACK_HALT_WINDOW * 1000)
+    end = np.clip(end, start + 1, len(ts_ms) - 1)
+    window_km = haversine_km(lat[start], lon[start], lat[end], lon[end])
+    window_hours = (ts_ms[end] - ts_ms[start]) / 3_600_000
+    speed = np.divide(window_km, window_hours, out=np.zeros_like(window_km), where=window_hours > 0)
+    moving = speed >= TRACK_HALT_SPEED_KMH
+
+    moving_hours = float(hours[moving].sum())
+    # distance while halted is GPS jitter, not riding
+    moving_km = float(dist[moving].sum())
+    return {
+        "points": int(len(ts_ms)),
+        "distanceKm": round(moving_km, 3),
+        "durationHours": round(float(hours.sum()), 4),
+        "movingHours": round(moving_hours, 4),
+        "haltHours": round(float(hours[~moving].sum()), 4),
+        # under a second of movement gives no meaningful speed
+        "avgSpeedKmh": round(moving_km / moving_hours, 2) if moving_hours * 3600 >= 1 else 0.0,
+    }
+
+
+async def ride_track_stats(db: AsyncSession, ride_id) -> Dict[str, dict]:
+    return {uid: track_stats(*track) for uid, track in (await load_tracks(db, ride_id)).items()}
+
+
+async def get_track_stats(db: AsyncSession, ride_id, requester_id) -> Dict[str, dict]:
+    """Per-rider stats of a ride, for its host and approved riders only."""
+    host_id = (await db.execute(select(Ride.hostId).where(Ride.rideId == ride_id))).scalar_one_or_none()
+    if host_id is None:
+        raise ValueError("Ride not found")
+    if host_id != requester_id:
+        approved = await db.execute(
+            select(RideParticipant.userId).where(
+                RideParticipant.rideId == ride_id,
+                RideParticipant.userId == requester_id,
+                RideParticipant.status == ParticipantStatus.APPROVED,
+            )
+        )
+        if approved.first() is None:
+            raise PermissionError("Only the ride's riders can see its tracks")
+    return await ride_track_stats(db, ride_id)
+
+
+async def backfill_ride_durations(db: AsyncSession, ride_id) -> Optional[dict]:
+    """Set rideDuration/haltDuration (hours) from the recorded track.
+
+    Uses the host's track, or the longest one if the host recorded none.
+    Returns the stats used, or None if nothing was recorded.
+    """
+    host_id = (await db.execute(select(Ride.hostId).where(Ride.rideId == ride_id))).scalar_one_or_none()
+    if host_id is None:
+        raise ValueError("Ride not found")
+
+    stats = await ride_track_stats(db, ride_id)
+    if not stats:
+        return None
+    chosen = stats.get(str(host_id)) or max(stats.values(), key=lambda s: s["points"])
+    await db.execute(
+        update(Ride)
+        .where(Ride.rideId == ride_id)
+        .values(rideDuration=chosen["durationHours"], haltDuration=chosen["haltHours"])
+    )
+    await db.commit()
+    return chosen
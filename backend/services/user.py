@@ -1,29 +1,34 @@
-from sqlalchemy.orm import Session
-from pwdlib import PasswordHash
+from sqlalchemy import select, delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
 import uuid
 from datetime import datetime, timezone
-from db.models import User
+from db.models import User, UserTokenVersion, Ride, RideParticipant, ParticipantStatus
+from services.password import hash_password
+from services.auth import invalidate_user
+from services.ride import rides_changed
 from typing import Optional, List
 
-password_hash = PasswordHash.recommended()
-
 
 #-------------------
 # User operations
 #-------------------
-def create_user(
-    db: Session,
+def _by_username(username: str):
+    return select(User).where(User.username == username)
+
+
+async def create_user(
+    db: AsyncSession,
     username: str,
     name: str,
     bikeName: str,
     password: str,
     ) -> User:
 
-    existing_user = db.query(User).filter(User.username == username).first()
+    existing_user = (await db.execute(_by_username(username))).scalar_one_or_none()
     if existing_user:
         raise ValueError("username already exists")
 
-    hashed_password = password_hash.hash(password)
+    hashed_password = await hash_password(password)
 
     new_user = User(
         userId=uuid.uuid4(),
@@ -35,20 +40,21 @@ def create_user(
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    db.add(UserTokenVersion(userId=new_user.userId, version=1))
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 
-def edit_user_info(
-    db: Session,
+async def edit_user_info(
+    db: AsyncSession,
     username: str,
     name: Optional[str] = None,
     bikeName: Optional[str] = None,
 ) -> Optional[User]:
 
-    existing_user = db.query(User).filter(User.username == username).first()
+    existing_user = (await db.execute(_by_username(username))).scalar_one_or_none()
 
     if not existing_user:
         return None
@@ -59,24 +65,38 @@ def edit_user_info(
     if bikeName is not None:
         existing_user.bikeName = bikeName
 
-    db.commit()
-    db.refresh(existing_user)
+    await db.commit()
+    await db.refresh(existing_user)
+    await invalidate_user(username)
 
     return existing_user
 
 
-def delete_user(db: Session, username: str) -> bool:
-    user = db.query(User).filter(User.username == username).first()
-
-    if not user:
-        return False
-
-    db.delete(user)
-    db.commit()
-    return True
-
-def get_all_users(db: Session) -> List[User]:
-    return db.query(User).all()
+async def delete_user(db: AsyncSession, username: str) -> bool:
+    # the cascade drops their participations but not the seats those held
+    approved_in = (
+        select(RideParticipant.rideId)
+        .join(User, User.userId == RideParticipant.userId)
+        .where(User.username == username, RideParticipant.status == ParticipantStatus.APPROVED)
+    )
+    await db.execute(
+        update(Ride)
+        .where(Ride.rideId.in_(approved_in))
+        .values(approvedCount=Ride.approvedCount - 1)
+    )
+    # bulk delete: rides/participations/comments go via ON DELETE CASCADE
+    # instead of the ORM loading every relationship first
+    stmt = delete(User).where(User.username == username).returning(User.userId)
+    user_id = (await db.execute(stmt)).scalar_one_or_none()
+    await db.commit()
+    await invalidate_user(username, user_id)
+    if user_id is not None:
+        # their rides and participations went with them
+        await rides_changed()
+    return user_id is not None
+
+async def get_all_users(db: AsyncSession) -> List[User]:
+    return list((await db.execute(select(User))).scalars().all())
 
 
 
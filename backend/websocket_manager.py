@@ -1,21 +1,308 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import psycopg
 from fastapi import WebSocket
-from typing import Dict
+from starlette.websockets import WebSocketState
+from sqlalchemy import func, select
+
+from db.database import get_async_engine, get_libpq_dsn
+
+logger = logging.getLogger(__name__)
+
+BROADCAST_BACKEND = os.getenv("BROADCAST_BACKEND", "postgres")
+BROADCAST_CHANNEL = os.getenv("BROADCAST_CHANNEL", "ridealong_events")
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7999
+
+OnMessage = Callable[[str], Awaitable[None]]
+
+
+def _encode(envelope: dict) -> str:
+    # raw UTF-8 (at most 4 bytes a character) rather than \uXXXX escapes (6,
+    # or 12 for an emoji), so non-Latin text fits NOTIFY_PAYLOAD_LIMIT too
+    return json.dumps(envelope, default=str, ensure_ascii=False)
+
+
+# -------------------------
+# Broadcast backends
+# -------------------------
+# Every worker subscribes on startup; a publish from any worker reaches all
+# of them, and each delivers to the sockets it holds locally.
+
+class BroadcastBackend:
+    async def start(self, on_message: OnMessage):
+        raise NotImplementedError
+
+    async def stop(self):
+        pass
+
+    async def publish(self, payload: str):
+        raise NotImplementedError
+
+
+class MemoryBroadcast(BroadcastBackend):
+    """Single-process backend, for tests and one-worker setups."""
 
-class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+        self._on_message: Optional[OnMessage] = None
+
+    async def start(self, on_message: OnMessage):
+        self._on_message = on_message
+
+    async def stop(self):
+        self._on_message = None
+
+    async def publish(self, payload: str):
+        if self._on_message is not None:
+            await self._on_message(payload)
+
+
+class PostgresBroadcast(BroadcastBackend):
+    """LISTEN/NOTIFY on the app database; one listening connection per worker."""
+
+    def __init__(self, channel: str = BROADCAST_CHANNEL, dsn: Optional[str] = None):
+        self.channel = channel
+        self.dsn = dsn
+        self._task: Optional[asyncio.Task] = None
+        self._ready = asyncio.Event()
+
+    async def start(self, on_message: OnMessage):
+        self._ready.clear()
+        self._task = asyncio.create_task(self._listen(on_message))
+        # don't accept traffic before this worker is subscribed
+        await asyncio.wait_for(self._ready.wait(), timeout=10)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self, on_message: OnMessage):
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(
+                    self.dsn or get_libpq_dsn(), autocommit=True
+                )
+                async with conn:
+                    await conn.execute(f'LISTEN "{self.channel}"')
+                    self._ready.set()
+                    async for notify in conn.notifies():
+                        try:
+                            await on_message(notify.payload)
+                        except Exception:
+                            logger.exception("broadcast handler failed")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("broadcast listener lost, reconnecting")
+                await asyncio.sleep(1)
+
+    async def publish(self, payload: str):
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            logger.error("broadcast payload too large for NOTIFY, dropped")
+            return
+        async with get_async_engine().begin() as conn:
+            await conn.execute(select(func.pg_notify(self.channel, payload)))
+
+
+def make_backend(name: str = BROADCAST_BACKEND) -> BroadcastBackend:
+    if name == "memory":
+        return MemoryBroadcast()
+    if name == "postgres":
+        return PostgresBroadcast()
+    raise RuntimeError(f"unknown BROADCAST_BACKEND {name!r}")
 
-    async def connect(self, user_id: str, websocket: WebSocket):
+
+# -------------------------
+# Connections
+# -------------------------
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+WS_SEND_TIMEOUT = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+# what to do when a client can't keep up: "close" it or "drop" the message
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "close")
+# server PINGs every interval; clients silent for the idle timeout are reaped
+WS_PING_INTERVAL = float(os.getenv("WS_PING_INTERVAL", "25"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+
+PING = json.dumps({"type": "PING"})
+
+
+class Connection:
+    """One socket with its own outbound queue drained by a writer task."""
+
+    def __init__(self, manager: "ConnectionManager", user_id: str, websocket: WebSocket):
+        self.manager = manager
+        self.user_id = user_id
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=WS_SEND_QUEUE_SIZE)
+        self.writer: Optional[asyncio.Task] = None
+        self.closing: Optional[asyncio.Task] = None
+        self.last_seen = asyncio.get_running_loop().time()
+
+    def start(self):
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def touch(self):
+        """Record inbound traffic (any message counts as a pong)."""
+        self.last_seen = asyncio.get_running_loop().time()
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.closing is None
+            and self.websocket.client_state == WebSocketState.CONNECTED
+            and self.websocket.application_state == WebSocketState.CONNECTED
+        )
+
+    def enqueue(self, text: str):
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            if WS_SLOW_CONSUMER_POLICY == "drop":
+                logger.warning("dropping message for slow websocket of %s", self.user_id)
+            elif self.closing is None:
+                logger.warning("closing slow websocket of %s", self.user_id)
+                self.closing = asyncio.create_task(self.close(code=1013))
+
+    async def _write_loop(self):
+        try:
+            while True:
+                text = await self.queue.get()
+                await asyncio.wait_for(self.websocket.send_text(text), WS_SEND_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # dead or stuck socket: drop it and close it, so a client that
+            # is still there reconnects instead of waiting on a silent socket
+            await self.close(code=1011)
+
+    async def close(self, code: int = 1000):
+        self.manager.disconnect(self)
+        try:
+            # a stuck peer must not hold up the writer or the reaper
+            await asyncio.wait_for(self.websocket.close(code=code), WS_SEND_TIMEOUT)
+        except Exception:
+            pass
+
+
+# -------------------------
+# Connection manager
+# -------------------------
+
+class ConnectionManager:
+    def __init__(self, backend: Optional[BroadcastBackend] = None):
+        # a user may have several tabs/devices open
+        self.active_connections: Dict[str, Set[Connection]] = {}
+        self.backend = backend or make_backend()
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._event_handlers: Dict[str, List[Callable[[dict], None]]] = {}
+
+    async def start(self):
+        await self.backend.start(self._on_broadcast)
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+
+    async def stop(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await self.backend.stop()
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self.active_connections),
+            "connections": sum(len(c) for c in self.active_connections.values()),
+        }
+
+    async def connect(self, user_id: str, websocket: WebSocket) -> Connection:
         await websocket.accept()
-        self.active_connections[user_id] = websocket
+        connection = Connection(self, user_id, websocket)
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        connection.start()
+        return connection
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
+    def disconnect(self, connection: Connection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections is not None:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[connection.user_id]
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
 
     async def send_to_user(self, user_id: str, message: dict):
-        websocket = self.active_connections.get(user_id)
-        if websocket:
-            await websocket.send_json(message)
+        await self.broadcast([user_id], message)
+
+    async def broadcast(self, user_ids: Iterable, message: dict):
+        """Fan a message out to these users on whichever worker holds them."""
+        envelope = {"userIds": [str(u) for u in user_ids], "message": message}
+        await self.backend.publish(_encode(envelope))
+
+    async def broadcast_many(self, items: Iterable):
+        """Several (user_ids, message) pairs in as few publishes as fit."""
+        envelopes = [
+            _encode({"userIds": [str(u) for u in user_ids], "message": message})
+            for user_ids, message in items
+        ]
+        batch: List[str] = []
+        size = 0
+        for envelope in envelopes:
+            # + separators of {"batch":[...]}
+            if batch and size + len(envelope.encode()) + 12 > NOTIFY_PAYLOAD_LIMIT:
+                await self.backend.publish('{"batch":[' + ",".join(batch) + "]}")
+                batch, size = [], 0
+            batch.append(envelope)
+            size += len(envelope.encode()) + 1
+        if batch:
+            await self.backend.publish('{"batch":[' + ",".join(batch) + "]}")
+
+    def on_event(self, name: str, handler: Callable[[dict], None]):
+        self._event_handlers.setdefault(name, []).append(handler)
+
+    async def publish_event(self, name: str, data: dict):
+        """Run the `name` handlers on every worker, e.g. to drop cache entries."""
+        await self.backend.publish(_encode({"event": name, "data": data}))
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(WS_PING_INTERVAL)
+            try:
+                await self.reap()
+            except Exception:
+                logger.exception("websocket heartbeat failed")
+
+    async def reap(self):
+        """Close idle or dead sockets and ping the rest."""
+        now = asyncio.get_running_loop().time()
+        for connections in list(self.active_connections.values()):
+            for connection in list(connections):
+                if not connection.alive or now - connection.last_seen > WS_IDLE_TIMEOUT:
+                    await connection.close(code=1001)
+                else:
+                    connection.enqueue(PING)
+
+    async def _on_broadcast(self, payload: str):
+        envelope = json.loads(payload)
+        if "event" in envelope:
+            for handler in self._event_handlers.get(envelope["event"], ()):
+                handler(envelope["data"])
+            return
+        for item in envelope.get("batch", (envelope,)):
+            self._deliver(item["userIds"], item["message"])
+
+    def _deliver(self, user_ids: List[str], message: dict):
+        # encode once; enqueueing never waits on a socket
+        text = json.dumps(message)
+        for user_id in user_ids:
+            for connection in list(self.active_connections.get(user_id, ())):
+                connection.enqueue(text)
 
 manager = ConnectionManager()
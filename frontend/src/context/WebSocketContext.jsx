@@ -1,45 +1,146 @@
 import { createContext, useContext, useEffect, useRef, useState } from "react";
 import { AuthContext } from "./AuthContext";
+import api from "../api/axios";
 
 export const WebSocketContext = createContext();
 
+// Notification ids are not delivered in order (they are taken before the
+// server commits), so duplicates are found against the ids already seen,
+// not against the highest one. The last id received is sent on reconnect
+// and the server replays everything dispatched around and after it; those
+// frames come marked "replayed" and are listed without alerting again.
+const LAST_ID_KEY = "lastNotificationId";
+const SEEN_KEY = "seenNotificationIds";
+const SEEN_MAX = 500;
+
+const loadSeen = () => {
+  try {
+    return JSON.parse(localStorage.getItem(SEEN_KEY)) || [];
+  } catch {
+    return [];
+  }
+};
+
 export const WebSocketProvider = ({ children }) => {
   const { token } = useContext(AuthContext);
   const wsRef = useRef(null);
+  const lastIdRef = useRef(Number(localStorage.getItem(LAST_ID_KEY)) || 0);
+  // oldest first, capped at SEEN_MAX; the Set mirrors it for lookups
+  const seenRef = useRef(loadSeen());
+  const seenSetRef = useRef(new Set(seenRef.current));
   const [notifications, setNotifications] = useState([]);
+  const [unreadCount, setUnreadCount] = useState(0);
+  // set when more was missed than the server replays: reload lists instead
+  const [replayTruncated, setReplayTruncated] = useState(false);
+
+  // false if this id was already handled
+  const remember = (id) => {
+    if (seenSetRef.current.has(id)) return false;
+    seenRef.current.push(id);
+    seenSetRef.current.add(id);
+    while (seenRef.current.length > SEEN_MAX) {
+      seenSetRef.current.delete(seenRef.current.shift());
+    }
+    lastIdRef.current = id;
+    localStorage.setItem(SEEN_KEY, JSON.stringify(seenRef.current));
+    localStorage.setItem(LAST_ID_KEY, String(id));
+    return true;
+  };
+
+  const refreshUnreadCount = async () => {
+    try {
+      const res = await api.get("/notifications/unread-count");
+      setUnreadCount(res.data.unread);
+    } catch (err) {
+      console.error("unread count failed:", err);
+    }
+  };
+
+  // marks what this client has shown; anything still in flight stays unread
+  const markAllRead = async () => {
+    const ids = notifications
+      .map((n) => n.notificationId)
+      .filter((id) => id !== undefined)
+      .slice(0, SEEN_MAX);
+    if (ids.length === 0) return;
+    await api.post("/notifications/read", { ids });
+    refreshUnreadCount();
+  };
 
   useEffect(() => {
-    if (!token) return;
+    if (!token) {
+      // logged out: the next user starts from their own notifications
+      lastIdRef.current = 0;
+      seenRef.current = [];
+      seenSetRef.current = new Set();
+      localStorage.removeItem(LAST_ID_KEY);
+      localStorage.removeItem(SEEN_KEY);
+      return;
+    }
 
-    const ws = new WebSocket(`ws://localhost:8000/ws?token=${token}`);
-    wsRef.current = ws;
+    let closed = false;
+    let retry = null;
 
-    ws.onopen = () => {
-      console.log("WebSocket connected");
-    };
+    const connect = () => {
+      // no last_id yet: nothing to replay
+      const lastId = lastIdRef.current ? `&last_id=${lastIdRef.current}` : "";
+      const ws = new WebSocket(`ws://localhost:8000/ws?token=${token}${lastId}`);
+      wsRef.current = ws;
 
-    ws.onmessage = (event) => {
-      try {
-        const data = JSON.parse(event.data);
-        console.log("Received:", data);
-        setNotifications((prev) => [data, ...prev]);
-        // Optionally: use browser notification
-        if (Notification.permission === "granted") {
-          new Notification("Ride Notification", { body: JSON.stringify(data) });
+      ws.onopen = () => {
+        console.log("WebSocket connected");
+        refreshUnreadCount();
+      };
+
+      ws.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data);
+          // server heartbeat: answer so the connection isn't reaped as idle
+          if (data.type === "PING") {
+            ws.send(JSON.stringify({ type: "PONG" }));
+            return;
+          }
+          if (data.type === "REPLAY_TRUNCATED") {
+            setReplayTruncated(true);
+            return;
+          }
+          if (data.notificationId !== undefined) {
+            // replay and live delivery overlap on purpose
+            if (!remember(data.notificationId)) return;
+          }
+          console.log("Received:", data);
+          setNotifications((prev) => [data, ...prev]);
+          if (data.replayed) {
+            // missed while away: no popup, and the count onopen fetched
+            // from the server already includes it
+            return;
+          }
+          if (data.notificationId !== undefined) {
+            setUnreadCount((n) => n + 1);
+          }
+          // Optionally: use browser notification
+          if (Notification.permission === "granted") {
+            new Notification("Ride Notification", { body: JSON.stringify(data) });
+          }
+        } catch (err) {
+          console.error("WS parse error:", err);
         }
-      } catch (err) {
-        console.error("WS parse error:", err);
-      }
-    };
+      };
 
-    ws.onclose = () => {
-      console.log("WebSocket disconnected, reconnecting in 2s...");
-      setTimeout(() => {
-        if (token) wsRef.current = new WebSocket(`ws://localhost:8000/ws?token=${token}`);
-      }, 2000);
+      ws.onclose = () => {
+        if (closed) return;
+        console.log("WebSocket disconnected, reconnecting in 2s...");
+        retry = setTimeout(connect, 2000);
+      };
     };
 
-    return () => ws.close();
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retry);
+      if (wsRef.current) wsRef.current.close();
+    };
   }, [token]);
 
   const sendMessage = (message) => {
@@ -49,7 +150,16 @@ export const WebSocketProvider = ({ children }) => {
   };
 
   return (
-    <WebSocketContext.Provider value={{ notifications, sendMessage }}>
+    <WebSocketContext.Provider
+      value={{
+        notifications,
+        sendMessage,
+        unreadCount,
+        markAllRead,
+        replayTruncated,
+        clearReplayTruncated: () => setReplayTruncated(false),
+      }}
+    >
       {children}
     </WebSocketContext.Provider>
   );
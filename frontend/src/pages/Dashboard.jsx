@@ -1,17 +1,22 @@
 import { useState, useEffect, useContext } from "react";
-import { Box, Tabs, Tab, CircularProgress, Typography, Stack, Fab } from "@mui/material";
+import { Box, Tabs, Tab, CircularProgress, Typography, Stack, Fab, Button } from "@mui/material";
 import AddIcon from "@mui/icons-material/Add";
 import RideCard from "../components/RideCard";
 import api from "../api/axios";
 import { AuthContext } from "../context/AuthContext";
 import { useNavigate } from "react-router-dom";
 
+const PAGE_SIZE = 20;
+
 export default function Dashboard() {
   const { token, currentUser, setCurrentUser } = useContext(AuthContext);
   const navigate = useNavigate();
   const [tab, setTab] = useState(0);
   const [rides, setRides] = useState([]);
+  // cursor of the next /rides page, null once the last one is loaded
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState("");
 
   // Fetch user data if token exists but currentUser is not loaded
@@ -33,18 +38,22 @@ export default function Dashboard() {
     }
   }, [token, currentUser, setCurrentUser, navigate]);
 
-  const fetchRides = async () => {
-    setLoading(true);
+  // one page at a time; more only when the user asks for it
+  const fetchRides = async (cursor = null) => {
+    const setBusy = cursor ? setLoadingMore : setLoading;
+    setBusy(true);
     setError("");
     try {
       const res = await api.get("/rides", {
         headers: { Authorization: `Bearer ${token}` },
+        params: { limit: PAGE_SIZE, ...(cursor && { cursor }) },
       });
-      setRides(res.data);
+      setRides((prev) => (cursor ? [...prev, ...res.data.items] : res.data.items));
+      setNextCursor(res.data.next_cursor);
     } catch (err) {
       setError(err.response?.data?.detail || "Error fetching rides");
     } finally {
-      setLoading(false);
+      setBusy(false);
     }
   };
 
@@ -113,6 +122,18 @@ export default function Dashboard() {
               <Typography>No rides found.</Typography>
             )}
           </Stack>
+
+          {nextCursor && (
+            <Box textAlign="center" mt={3}>
+              <Button
+                variant="outlined"
+                disabled={loadingMore}
+                onClick={() => fetchRides(nextCursor)}
+              >
+                {loadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </Box>
+          )}
         </>
       )}
 